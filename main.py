@@ -1,10 +1,61 @@
+import argparse
 import sys
-from pprint import pprint
 
 from pancake.interpreter.interpreter import Interpreter
+from pancake.interpreter.limits import Limits
+from pancake.interpreter.profile import Profiler
 
 if __name__ == "__main__":
-    file_name = sys.argv[1]
+    parser = argparse.ArgumentParser(description="Run a Pancake file")
+    parser.add_argument("file_name")
+    parser.add_argument("--pure-stdlib", action="store_true",
+                        help="use the Pancake definitions of map, filter etc. from stdlib/core.pan")
+    parser.add_argument("--no-optimize", action="store_true",
+                        help="don't inline small functions, fold constants or remove unused variables")
+    parser.add_argument("--no-jit", action="store_true",
+                        help="don't turn functions that are called a lot into Python code")
+    parser.add_argument("--dump", action="store_true",
+                        help="print the bytecode of the program and its functions instead of running it")
+    parser.add_argument("--profile", action="store_true",
+                        help="time every Pancake function call, printing the slowest functions at the end")
+    parser.add_argument("--profile-output", metavar="FILE",
+                        help="where to write collapsed stacks for flamegraph tools (default FILE_NAME.folded)")
+    parser.add_argument("--profile-top", metavar="N", type=int, default=20,
+                        help="how many functions to show in the profile (default 20)")
+    parser.add_argument("--max-steps", metavar="N", type=int,
+                        help="stop the program after it has run N instructions")
+    parser.add_argument("--max-depth", metavar="N", type=int,
+                        help="stop the program if it makes calls more than N deep (tail calls don't count)")
+    parser.add_argument("--max-stack", metavar="N", type=int,
+                        help="stop the program if there are more than N items on the stack")
+    parser.add_argument("--max-memory", metavar="MB", type=float,
+                        help="stop the program if its data takes up more than about MB megabytes")
+    args = parser.parse_args()
 
-    with open(file_name) as f:
-        Interpreter.interpret(f.read())
+    if args.dump:
+        with open(args.file_name) as f:
+            print(Interpreter.DUMP(f, native_stdlib=not args.pure_stdlib, optimize=not args.no_optimize))
+
+        sys.exit()
+
+    profiler = Profiler() if args.profile else None
+    limits = None
+
+    if any(limit is not None for limit in (args.max_steps, args.max_depth, args.max_stack, args.max_memory)):
+        limits = Limits(args.max_steps, args.max_depth, args.max_stack,
+                        None if args.max_memory is None else int(args.max_memory * 1024 * 1024))
+
+    try:
+        with open(args.file_name) as f:
+            Interpreter.interpret(f, native_stdlib=not args.pure_stdlib, file_name=args.file_name,
+                                  profiler=profiler, optimize=not args.no_optimize, limits=limits,
+                                  jit=not args.no_jit)
+    finally:
+        if profiler is not None:
+            output = args.profile_output or f"{args.file_name}.folded"
+
+            with open(output, "w") as f:
+                f.write(profiler.collapsed())
+
+            print(profiler.report(args.profile_top), file=sys.stderr)
+            print(f"Collapsed stacks written to {output}", file=sys.stderr)
@@ -0,0 +1,232 @@
+import asyncio
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from string import Template
+
+from pancake.interpreter.asynchronous import AsyncInterpreter
+from pancake.interpreter.interpreter import Interpreter
+
+PROGRAMS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "programs")
+
+# A module with size functions, f{i} calls f{2i + 1} (if there is one), so
+# f0 uses about log2(size) of them
+def large_module(size: int) -> str:
+    lines = []
+
+    for index in range(size):
+        child = 2 * index + 1
+
+        if child < size:
+            lines.append(f"{{ n : n 1 + f{child} }} =>f{index}")
+        else:
+            lines.append(f"{{ n : n 1 + }} =>f{index}")
+
+    return "\n".join(lines) + "\n"
+
+# A Pancake program from programs/, run once for each size. files gives the
+# other files the program needs for a size ({name: source}), which it can
+# find in $directory. Concurrent
+# benchmarks run size copies of the program at once with AsyncInterpreter,
+# cold ones load the stdlib every time instead of cloning the warm image
+class Benchmark:
+    def __init__(self, name, program, sizes, files=None, concurrent=False, cold=False):
+        self.name = name
+        self.program = program
+        self.sizes = sizes
+        self.files = files
+        self.concurrent = concurrent
+        self.cold = cold
+
+    def source(self, size: int, directory: str) -> str:
+        with open(os.path.join(PROGRAMS_DIR, self.program)) as f:
+            return Template(f.read()).substitute(size=size, directory=directory)
+
+BENCHMARKS = [
+    Benchmark("startup", "startup.pan", [0]),
+    Benchmark("cold-startup", "startup.pan", [0], cold=True),
+    Benchmark("recursion", "recursion.pan", [100, 1000, 10000]),
+    Benchmark("while", "while.pan", [1000, 10000, 100000]),
+    Benchmark("map-filter", "map_filter.pan", [1000, 10000, 100000]),
+    Benchmark("curry", "curry.pan", [1000, 10000, 100000]),
+    Benchmark("import", "import.pan", [100, 1000, 10000],
+              lambda size: {"module.pan": large_module(size)}),
+    Benchmark("require", "require.pan", [100, 1000, 10000],
+              lambda size: {"module.pan": large_module(size)}),
+    Benchmark("map", "map.pan", [1000, 10000, 100000]),
+    Benchmark("factorial", "factorial.pan", [100, 1000, 10000]),
+    Benchmark("prime", "prime.pan", [100, 1000, 3000]),
+    Benchmark("print", "print.pan", [1000, 10000, 100000]),
+    Benchmark("lines", "lines.pan", [1000, 10000, 100000],
+              lambda size: {"lines.txt": "".join(f"line {index}\n" for index in range(size))}),
+    Benchmark("scripts", "scripts.pan", [10, 100, 1000], concurrent=True),
+]
+
+# Runs a program repeat times for the fastest wall time, then once more
+# with tracemalloc on for the peak memory (tracing slows everything down,
+# so it isn't on while timing). Anything it prints goes to a file next to
+# it, the way a program's output usually ends up somewhere other than a
+# terminal
+def measure(source: str, file_name: str, repeat: int, cold: bool = False) -> dict:
+    output_name = os.path.join(os.path.dirname(file_name), "output.txt")
+
+    def run():
+        with open(output_name, "w") as output, contextlib.redirect_stdout(output):
+            if cold:
+                Interpreter(file_name=file_name).run(source)
+            else:
+                Interpreter.interpret(source, file_name=file_name)
+
+    times = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"time": min(times), "peak_memory": peak}
+
+# Runs count copies of a program at once on one event loop. time is how
+# long they take altogether, latency is the 99th percentile of how long a
+# script takes from being started to finishing
+def measure_concurrent(source: str, file_name: str, count: int, repeat: int) -> dict:
+    async def discard(text):
+        pass
+
+    # Scripts start off from the stdlib loaded once, like a service would
+    image = Interpreter.image()
+
+    async def run_script() -> float:
+        start = time.perf_counter()
+        await AsyncInterpreter(file_name=file_name, output=discard, image=image).run(source)
+        return time.perf_counter() - start
+
+    async def run_scripts() -> list:
+        return await asyncio.gather(*(run_script() for _ in range(count)))
+
+    # (time, latencies) of each run, the fastest one is kept
+    runs = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        latencies = sorted(asyncio.run(run_scripts()))
+        runs.append((time.perf_counter() - start, latencies))
+
+    fastest, latencies = min(runs)
+
+    tracemalloc.start()
+
+    try:
+        asyncio.run(run_scripts())
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"time": fastest, "peak_memory": peak, "latency": latencies[int(len(latencies) * 0.99)]}
+
+# Results are keyed by name/size (e.g. map-filter/1000)
+def run_benchmark(benchmark: Benchmark, size: int, repeat: int) -> dict:
+    directory = tempfile.mkdtemp(prefix="pancake-bench-")
+
+    try:
+        for name, source in (benchmark.files(size) if benchmark.files else {}).items():
+            with open(os.path.join(directory, name), "w") as f:
+                f.write(source)
+
+        # Imports are looked up next to this file
+        file_name = os.path.join(directory, benchmark.program)
+
+        if benchmark.concurrent:
+            return measure_concurrent(benchmark.source(size, directory), file_name, size, repeat)
+        else:
+            return measure(benchmark.source(size, directory), file_name, repeat, benchmark.cold)
+    finally:
+        shutil.rmtree(directory)
+
+# Deep recursion uses a lot of Python stack, so the benchmarks run on a
+# thread with a much bigger stack than the main one
+def run_with_big_stack(fn, *args):
+    result = {}
+
+    def target():
+        try:
+            result["value"] = fn(*args)
+        except BaseException as e:
+            result["error"] = e
+
+    old_limit = sys.getrecursionlimit()
+    old_size = threading.stack_size(512 * 1024 * 1024)
+    sys.setrecursionlimit(1_000_000)
+
+    try:
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join()
+    finally:
+        threading.stack_size(old_size)
+        sys.setrecursionlimit(old_limit)
+
+    if "error" in result:
+        raise result["error"]
+
+    return result["value"]
+
+# Runs every benchmark (or just the ones in names), calling report with
+# each result as it finishes
+def run_all(names=None, repeat=3, largest=None, report=None) -> dict:
+    results = {}
+
+    for benchmark in BENCHMARKS:
+        if names and benchmark.name not in names:
+            continue
+
+        for size in benchmark.sizes:
+            if largest is not None and size > largest:
+                continue
+
+            key = f"{benchmark.name}/{size}"
+
+            # Every script gets a thread, which would get the big stack too
+            if benchmark.concurrent:
+                results[key] = run_benchmark(benchmark, size, repeat)
+            else:
+                results[key] = run_with_big_stack(run_benchmark, benchmark, size, repeat)
+
+            if report is not None:
+                report(key, results[key])
+
+    return results
+
+# Compares results against a baseline, returning {key: {measurement: ratio}}
+# for everything that got more than tolerance (e.g. 0.25 = 25%) worse
+def compare(results: dict, baseline: dict, tolerance: float) -> dict:
+    regressions = {}
+
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+
+        for measurement in ("time", "peak_memory", "latency"):
+            if measurement not in result or measurement not in baseline[key]:
+                continue
+
+            old = baseline[key][measurement]
+            new = result[measurement]
+
+            if old > 0 and new / old > 1 + tolerance:
+                regressions.setdefault(key, {})[measurement] = new / old
+
+    return regressions
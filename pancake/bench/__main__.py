@@ -0,0 +1,62 @@
+import argparse
+import json
+import platform
+import sys
+
+import pancake
+from pancake.bench import BENCHMARKS, compare, run_all
+
+def describe(key: str, result: dict, baseline: dict) -> str:
+    line = f"{key:<22} {result['time'] * 1000:>10.1f} ms {result['peak_memory'] / 1024:>10.0f} KiB"
+
+    if "latency" in result:
+        line += f" {result['latency'] * 1000:>10.1f} ms p99"
+
+    if key in baseline:
+        old = baseline[key]
+        line += f"   time x{result['time'] / old['time']:.2f}, memory x{result['peak_memory'] / max(old['peak_memory'], 1):.2f}"
+
+    return line
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m pancake.bench",
+                                     description="Benchmark the Pancake interpreter")
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    parser.add_argument("-b", "--baseline", help="JSON file from an earlier run to compare against")
+    parser.add_argument("-t", "--tolerance", type=float, default=0.25,
+                        help="how much slower/bigger than the baseline counts as a regression (default 0.25)")
+    parser.add_argument("-r", "--repeat", type=int, default=3,
+                        help="timed runs per program, the fastest one is kept (default 3)")
+    parser.add_argument("--largest", type=int, help="skip sizes bigger than this")
+    parser.add_argument("names", nargs="*",
+                        help=f"benchmarks to run (default all): {', '.join(benchmark.name for benchmark in BENCHMARKS)}")
+    args = parser.parse_args()
+
+    for name in args.names:
+        if name not in [benchmark.name for benchmark in BENCHMARKS]:
+            parser.error(f"unknown benchmark {name}")
+
+    baseline = {}
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+
+    results = run_all(args.names, args.repeat, args.largest,
+                      lambda key, result: print(describe(key, result, baseline), flush=True))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "pancake": pancake.__version__,
+                "python": platform.python_version(),
+                "results": results
+            }, f, indent=2)
+
+    regressions = compare(results, baseline, args.tolerance)
+
+    for key, ratios in regressions.items():
+        changes = ", ".join(f"{measurement} x{ratio:.2f}" for measurement, ratio in ratios.items())
+        print(f"REGRESSION {key}: {changes}")
+
+    sys.exit(1 if regressions else 0)
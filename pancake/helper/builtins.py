@@ -1,102 +1,115 @@
-from copy import deepcopy
+import itertools
+from collections import OrderedDict
 from typing import Callable
 
 import pancake.interpreter.interpreter as interpreter
-import pancake.interpreter.eval as evaluate
+import pancake.interpreter.parallel as parallel
+from pancake.helper.closure import Closure
+from pancake.helper.deref import Deref
 from pancake.helper.function import Function
+from pancake.helper.lines import Lines
 from pancake.helper.pancake_error import PancakeError
+from pancake.helper.persistent_list import PersistentList
+from pancake.helper.persistent_map import MISSING, PersistentMap, PersistentSet
+from pancake.helper.seq import FILTER, MAP, REJECT, TAKE, TAKE_WHILE, Seq, pop_length, pop_list
 from pancake.helper.symbol import Symbol
 from pancake.helper.variable import Variable
+from pancake.helper.vector import is_vector, numpy, require_numpy, to_python, to_vector
+from pancake.interpreter.buffer import UNBUFFERED
 from pancake.interpreter.print import pancake_print
 
 class Builtin(Function):
+    is_builtin = True
+    # Builtins with side effects (printing, reading input...) can't be used
+    # by memoized functions
+    pure = True
+
     def __init__(self):
         super().__init__(args=[], body=[], parent_id=-1)
 
+    # Runs the builtin as the last call of a function body, returning the
+    # function that should be called next (if any) so the VM can run it
+    # without nesting another Python call
+    def execute_tail(self, stack, function_scope, variable_scope):
+        self.execute(stack, function_scope, variable_scope)
+
+# Where print/stack write to, the output buffer of the interpreter running
+# the code (stdout, unbuffered, outside of one)
+def output():
+    current = interpreter.Interpreter.current()
+    return UNBUFFERED if current is None else current.buffer
+
 # GENERAL BUILTINS
 
 class Execute(Builtin):
     def execute(self, stack, function_scope, variable_scope):
-        # Fix scoping inside nested functions, can change variables in
-        # outer scope
-        func = stack.pop()
+        func = self.execute_tail(stack, function_scope, variable_scope)
         func.execute(stack, function_scope, variable_scope)
-        self.scope_updates = func.scope_updates
+
+    def execute_tail(self, stack, function_scope, variable_scope):
+        return stack.pop()
 
 class If(Builtin):
     def execute(self, stack, function_scope, variable_scope):
+        func = self.execute_tail(stack, function_scope, variable_scope)
+        func.execute(stack, function_scope, variable_scope)
+
+    def execute_tail(self, stack, function_scope, variable_scope):
         predicate = stack.pop()
         true = stack.pop()
         false = stack.pop()
 
         if predicate:
-            true.execute(stack, function_scope, variable_scope)
-            self.scope_updates = true.scope_updates
+            return true
         else:
-            false.execute(stack, function_scope, variable_scope)
-            self.scope_updates = false.scope_updates
+            return false
 
 class Import(Builtin):
+    pure = False
+
     def __init__(self):
         super().__init__()
 
     def execute(self, stack, function_scope, variable_scope):
         file_name = stack.pop()
+        module = interpreter.Interpreter.current().modules.load(file_name, function_scope)
+        module.define_all(function_scope)
 
-        with open(file_name) as f:
-            new_fscope = {}
-            new_vscope = {}
-
-            forms = interpreter.Interpreter.READ(f.read())
-            evaluate.evaluate(forms, [], new_fscope, new_vscope)
-
-            function_scope |= new_fscope
-
-            for vname in new_vscope:
-                self.scope_updates[vname] = new_vscope[vname]
-                
-            variable_scope |= new_vscope
+        function_scope |= module.function_scope
+        variable_scope |= module.variable_scope
 
 class Input(Builtin):
+    pure = False
+
     def execute(self, stack, function_scope, variable_scope):
         string = stack.pop()
-        stack.append(input(string))
+        current = interpreter.Interpreter.current()
+
+        stack.append(input(string) if current is None else current.read_line(string))
 
 class Print(Builtin):
+    pure = False
+
     def execute(self, stack, function_scope, variable_scope):
         a = stack.pop()
-        print(pancake_print(a))
+        output().write(pancake_print(a) + "\n")
+
+class Flush(Builtin):
+    pure = False
+
+    def execute(self, stack, function_scope, variable_scope):
+        output().flush()
 
 class Stack(Builtin):
+    pure = False
+
     def execute(self, stack, function_scope, variable_scope):
-        print([str(x) for x in stack])
+        output().write(str([str(x) for x in stack]) + "\n")
 
 class Require(Builtin):
-    @staticmethod
-    def imports_for_function(body, fscope, vscope, already_imported) -> tuple[list, list]:
-        function_imports = set()
-        variable_imports = set()
-
-        for form in body:
-            if isinstance(form, Variable) and form.name not in already_imported:
-                if form.name in fscope.keys():
-                    function_imports.add(form.name)
-                    already_imported.append(form.name)
-
-                    inner_fimports, inner_vimports = Require.imports_for_function(fscope[form.name].body, fscope, vscope, already_imported)
-                    function_imports |= inner_fimports
-                    variable_imports |= inner_vimports
-                elif form.name in vscope.keys():
-                    variable_imports.add(form.name)
-                    already_imported.append(form.name)
-            elif isinstance(form, Function):
-                inner_fimports, inner_vimports = Require.imports_for_function(form.body, fscope, vscope, already_imported)
-                function_imports |= inner_fimports
-                variable_imports |= inner_vimports
-
-        return function_imports, variable_imports
-
-    def execute(self, stack, function_scope, variable_scope):  
+    pure = False
+
+    def execute(self, stack, function_scope, variable_scope):
         file_name = stack.pop()
         require_names = []
 
@@ -104,40 +117,16 @@ class Require(Builtin):
             if not isinstance(item, Symbol):
                 raise TypeError("Only symbols can be used for require!")
 
-            require_names.append(item)
+            require_names.append(item.name)
 
-        with open(file_name) as f:
-            new_fscope = {}
-            new_vscope = {}
-
-            forms = interpreter.Interpreter.READ(f.read())
-            evaluate.evaluate(forms, [], new_fscope, new_vscope)
-
-            for fname in new_fscope.keys():
-                if fname in require_names:
-                    fimports, vimports = Require.imports_for_function(new_fscope[fname].body, new_fscope, new_vscope, [])
-                    
-                    for fimport in fimports:
-                        function_scope[fimport] = new_fscope[fimport]
-
-                    for vimport in vimports:
-                        variable_scope[vimport] = new_vscope[vimport]
-
-                    function_scope[fname] = new_fscope[fname]
-                
-            for vname in new_vscope.keys():
-                if vname in require_names and isinstance(new_vscope[vname], Function):
-                    fimports, vimports = Require.imports_for_function(new_vscope[vname].body, new_fscope, new_vscope, [])
-                        
-                    for fimport in fimports:
-                        function_scope[fimport] = new_fscope[fimport]
-
-                    for vimport in vimports:
-                        variable_scope[vimport] = new_vscope[vimport]
-                        self.scope_updates[vimport] = new_vscope[vimport]
-
-                variable_scope[vname] = new_vscope[vname]
-                self.scope_updates[vname] = new_vscope[vname]
+        module = interpreter.Interpreter.current().modules.load(file_name, function_scope)
+
+        # Only the required names and what they depend on get evaluated
+        for name in module.define(require_names, function_scope):
+            if name in module.function_scope:
+                function_scope[name] = module.function_scope[name]
+            else:
+                variable_scope[name] = module.variable_scope[name]
 
 class Throw(Builtin):
     def execute(self, stack, function_scope, variable_scope):
@@ -154,6 +143,46 @@ class Try(Builtin):
         except:
             except_clause.execute(stack, function_scope, variable_scope)
 
+# FILES
+
+# A lazy sequence of the lines in a file, see Lines
+class ReadLines(Builtin):
+    pure = False
+
+    def execute(self, stack, function_scope, variable_scope):
+        file_name = stack.pop()
+
+        stack.append(Seq(Lines(file_name)))
+
+class Read(Builtin):
+    pure = False
+
+    def execute(self, stack, function_scope, variable_scope):
+        file_name = stack.pop()
+
+        with open(file_name) as f:
+            stack.append(f.read())
+
+# Strings are written as they are, lists (or lines) a line per item, one
+# at a time, so a stream of lines never has to be in memory all at once
+class Write(Builtin):
+    pure = False
+    mode = "w"
+
+    def execute(self, stack, function_scope, variable_scope):
+        file_name = stack.pop()
+        contents = stack.pop()
+
+        with open(file_name, self.mode) as f:
+            if isinstance(contents, str):
+                f.write(contents)
+            else:
+                for item in contents:
+                    f.write(pancake_print(item) + "\n")
+
+class AppendFile(Write):
+    mode = "a"
+
 # LOGIC
 
 class And(Builtin):
@@ -249,37 +278,559 @@ class Plus(Builtin):
 
 # LIST STUFF
 
+# Maps and sets can't be gone through like lists (keys and values give
+# lists of what's in them), so they aren't turned into something else
+# depending on whether a builtin indexes or iterates
+def require_list(value, name: str):
+    if isinstance(value, (PersistentMap, PersistentSet)):
+        raise TypeError(f"{name} only works on lists, use keys or values to go through a map or set!")
+
 class Append(Builtin):
     def execute(self, stack, function_scope, variable_scope):
-        ls = deepcopy(stack.pop())
+        ls = stack.pop()
         element = stack.pop()
 
-        ls.append(element)
-        stack.append(ls)
+        stack.append(ls.append(element))
 
 class Length(Builtin):
+    def execute(self, stack, function_scope, variable_scope):
+        stack.append(pop_length(stack))
+
+class Nth(Builtin):
     def execute(self, stack, function_scope, variable_scope):
         ls = stack.pop()
+        n = stack.pop()
+        require_list(ls, self.name)
 
-        stack.append(len(ls))
+        stack.append(to_python(ls[n]))
 
-class Nth(Builtin):
+# MAPS AND SETS (see PersistentMap, sets work like maps from each item to
+# itself, and get added to with append)
+
+def require_collection(value, name: str):
+    if not isinstance(value, (PersistentMap, PersistentSet)):
+        raise TypeError(f"{name} only works on maps and sets!")
+
+class Get(Builtin):
+    def execute(self, stack, function_scope, variable_scope):
+        collection = stack.pop()
+        key = stack.pop()
+        require_collection(collection, "get")
+
+        value = collection.get(key, MISSING)
+
+        if value is MISSING:
+            raise KeyError(key)
+
+        stack.append(value)
+
+class Assoc(Builtin):
+    def execute(self, stack, function_scope, variable_scope):
+        collection = stack.pop()
+        key = stack.pop()
+        value = stack.pop()
+
+        if not isinstance(collection, PersistentMap):
+            raise TypeError("assoc only works on maps!")
+
+        stack.append(collection.assoc(key, value))
+
+class Dissoc(Builtin):
+    def execute(self, stack, function_scope, variable_scope):
+        collection = stack.pop()
+        key = stack.pop()
+        require_collection(collection, "dissoc")
+
+        stack.append(collection.dissoc(key))
+
+# Works on lists too, going through them one item at a time
+class Has(Builtin):
+    def execute(self, stack, function_scope, variable_scope):
+        collection = stack.pop()
+        key = stack.pop()
+
+        stack.append(key in collection)
+
+class Keys(Builtin):
+    def execute(self, stack, function_scope, variable_scope):
+        collection = stack.pop()
+        require_collection(collection, "keys")
+
+        stack.append(PersistentList.from_iterable(collection))
+
+class Values(Builtin):
+    def execute(self, stack, function_scope, variable_scope):
+        collection = stack.pop()
+        require_collection(collection, "values")
+
+        if isinstance(collection, PersistentMap):
+            stack.append(PersistentList.from_iterable(collection.values()))
+        else:
+            stack.append(PersistentList.from_iterable(collection))
+
+def require_same(a, b, name: str):
+    require_collection(a, name)
+
+    if type(a) is not type(b):
+        raise TypeError(f"{name} only works on two maps or two sets!")
+
+# Everything in either, a value in b wins over one for the same key in a.
+# The smaller one is added to the bigger one, which is shared with the
+# result
+class Union(Builtin):
+    def execute(self, stack, function_scope, variable_scope):
+        b = stack.pop()
+        a = stack.pop()
+        require_same(a, b, "union")
+
+        if isinstance(a, PersistentSet):
+            bigger, smaller = (a, b) if len(a) >= len(b) else (b, a)
+
+            for item in smaller:
+                bigger = bigger.append(item)
+
+            stack.append(bigger)
+        elif len(a) > len(b):
+            for key, value in b.items():
+                a = a.assoc(key, value)
+
+            stack.append(a)
+        else:
+            for key, value in a.items():
+                if key not in b:
+                    b = b.assoc(key, value)
+
+            stack.append(b)
+
+# Everything in a with a key that's also in b, only the smaller one is gone
+# through
+class Intersect(Builtin):
+    def execute(self, stack, function_scope, variable_scope):
+        b = stack.pop()
+        a = stack.pop()
+        require_same(a, b, "intersect")
+
+        if isinstance(a, PersistentSet):
+            smaller, bigger = (a, b) if len(a) <= len(b) else (b, a)
+            stack.append(PersistentSet.from_iterable(item for item in smaller if item in bigger))
+        elif len(a) <= len(b):
+            stack.append(PersistentMap.from_items((key, value) for key, value in a.items() if key in b))
+        else:
+            stack.append(PersistentMap.from_items((key, a[key]) for key in b if key in a))
+
+# STDLIB (native versions of functions from stdlib/core.pan, these
+# replace the Pancake definitions when the stdlib is loaded). range gives
+# a lazy sequence (see Seq), and map/filter/reject/take/take-while add a
+# stage to one instead of building a list. Given a list they still build
+# one straight away, like the Pancake versions do
+
+# Stands in for the first item of an empty list
+EMPTY = object()
+
+# Same as [] start {: =index index swap append index inc } {: dup end < } while
+def range_list(start, end) -> PersistentList:
+    result = PersistentList()
+    index = start
+
+    while index < end:
+        result = result.append(index)
+        index += 1
+
+    return result
+
+class IsEmpty(Builtin):
+    def execute(self, stack, function_scope, variable_scope):
+        ls = stack.pop()
+
+        # Only needs to get as far as the first item of a Seq
+        if isinstance(ls, Seq):
+            stack.append(next(iter(ls), EMPTY) is EMPTY)
+        else:
+            stack.append(len(ls) == 0)
+
+class First(Builtin):
+    def execute(self, stack, function_scope, variable_scope):
+        ls = stack.pop()
+        require_list(ls, self.name)
+
+        stack.append(to_python(ls[0]))
+
+class Slice(Builtin):
+    def execute(self, stack, function_scope, variable_scope):
+        ls = stack.pop()
+        end = stack.pop()
+        start = stack.pop()
+        require_list(ls, self.name)
+
+        if isinstance(ls, Seq):
+            stack.append(PersistentList.from_iterable(itertools.islice(ls, start, end)))
+        else:
+            stack.append(PersistentList.from_iterable(ls[index] for index in range_list(start, end)))
+
+class Rest(Builtin):
+    def execute(self, stack, function_scope, variable_scope):
+        ls = stack.pop()
+        require_list(ls, self.name)
+
+        if isinstance(ls, Seq):
+            stack.append(PersistentList.from_iterable(itertools.islice(ls, 1, None)))
+        else:
+            stack.append(PersistentList.from_iterable(ls[index] for index in range_list(1, len(ls))))
+
+class Range(Builtin):
+    def execute(self, stack, function_scope, variable_scope):
+        end = stack.pop()
+        start = stack.pop()
+
+        if isinstance(start, int) and isinstance(end, int):
+            stack.append(Seq(range(start, end)))
+        else:
+            stack.append(Seq(range_list(start, end)))
+
+# Items are pushed one at a time and fn can use anything else on the
+# stack, like the accumulators in map/filter
+class For(Builtin):
+    def execute(self, stack, function_scope, variable_scope):
+        fn = stack.pop()
+        require_list(stack[-1], self.name)
+
+        # Not kept in a variable, so the items of a Seq can be let go of
+        # once they've been gone past
+        for item in stack.pop():
+            stack.append(item)
+            fn.execute(stack, function_scope, variable_scope)
+
+class Reverse(Builtin):
     def execute(self, stack, function_scope, variable_scope):
         ls = stack.pop()
+        require_list(ls, self.name)
+
+        if isinstance(ls, Seq):
+            ls = ls.realize()
+
+        stack.append(PersistentList.from_iterable(ls[index] for index in range(len(ls) - 1, -1, -1)))
+
+class Map(Builtin):
+    def execute(self, stack, function_scope, variable_scope):
+        fn = stack.pop()
+        ls = stack.pop()
+        require_list(ls, self.name)
+
+        if isinstance(ls, Seq):
+            stack.append(ls.then(MAP, fn, function_scope, variable_scope))
+            return
+
+        stack.append(PersistentList())
+
+        for item in ls:
+            stack.append(item)
+            fn.execute(stack, function_scope, variable_scope)
+
+            result = stack.pop()
+            stack.append(stack.pop().append(result))
+
+class Filter(Builtin):
+    keep = True
+    stage = FILTER
+
+    def execute(self, stack, function_scope, variable_scope):
+        fn = stack.pop()
+        ls = stack.pop()
+        require_list(ls, self.name)
+
+        if isinstance(ls, Seq):
+            stack.append(ls.then(self.stage, fn, function_scope, variable_scope))
+            return
+
+        stack.append(PersistentList())
+
+        for item in ls:
+            stack.append(item)
+            fn.execute(stack, function_scope, variable_scope)
+
+            if bool(stack.pop()) == self.keep:
+                stack.append(stack.pop().append(item))
+
+class Reject(Filter):
+    keep = False
+    stage = REJECT
+
+class Take(Builtin):
+    def execute(self, stack, function_scope, variable_scope):
         n = stack.pop()
+        ls = stack.pop()
+        require_list(ls, self.name)
+
+        if isinstance(ls, Seq):
+            stack.append(ls.then(TAKE, n))
+        else:
+            stack.append(PersistentList.from_iterable(itertools.islice(ls, max(n, 0))))
+
+class TakeWhile(Builtin):
+    def execute(self, stack, function_scope, variable_scope):
+        fn = stack.pop()
+        ls = stack.pop()
+        require_list(ls, self.name)
+
+        if isinstance(ls, Seq):
+            stack.append(ls.then(TAKE_WHILE, fn, function_scope, variable_scope))
+            return
+
+        result = PersistentList()
+
+        for item in ls:
+            stack.append(item)
+            fn.execute(stack, function_scope, variable_scope)
+
+            if not stack.pop():
+                break
+
+            result = result.append(item)
+
+        stack.append(result)
+
+class Realize(Builtin):
+    def execute(self, stack, function_scope, variable_scope):
+        require_list(stack[-1], self.name)
+        stack.append(pop_list(stack))
+
+# Goes through the items one at a time, so a Seq is never turned into a list
+class Reduce(Builtin):
+    def execute(self, stack, function_scope, variable_scope):
+        fn = stack.pop()
+        require_list(stack[-1], self.name)
+        items = iter(stack.pop())
+        first = next(items, EMPTY)
+
+        if first is EMPTY:
+            raise IndexError("list index out of range")
+
+        stack.append(first)
+
+        for item in items:
+            stack.append(item)
+            fn.execute(stack, function_scope, variable_scope)
+
+# PARALLEL (not part of the stdlib, so these are always there)
+
+# Same as map/filter, but the items are spread across a pool of processes
+# (see parallel.py). fn only gets the item on its stack, and anything it
+# changes besides its result is thrown away, so it should be pure (what it
+# prints still shows up, in the same order as it would with map/filter)
+
+class ParallelMap(Builtin):
+    def execute(self, stack, function_scope, variable_scope):
+        fn = stack.pop()
+        ls = stack.pop()
+        require_list(ls, self.name)
+
+        stack.append(PersistentList.from_iterable(parallel.parallel_apply(fn, ls, function_scope, variable_scope)))
+
+class ParallelFilter(Builtin):
+    def execute(self, stack, function_scope, variable_scope):
+        fn = stack.pop()
+        require_list(stack[-1], self.name)
+        ls = list(stack.pop())
+        keep = parallel.parallel_apply(fn, ls, function_scope, variable_scope)
+
+        stack.append(PersistentList.from_iterable(item for item, result in zip(ls, keep) if result))
+
+# MEMOIZATION
+
+# Default number of results a memoized function keeps
+MEMO_SIZE = 1024
+
+# Turns an argument into something that can be used as a dictionary key,
+# lists and vectors (which can't be hashed) are keyed by their items. The
+# type is part of the key so 1 and 1.0 aren't treated as the same argument
+def memo_key(value):
+    if isinstance(value, (PersistentList, Seq)):
+        return (PersistentList, tuple(memo_key(item) for item in value))
+    elif isinstance(value, PersistentMap):
+        return (PersistentMap, frozenset((memo_key(key), memo_key(item)) for key, item in value.items()))
+    elif isinstance(value, PersistentSet):
+        return (PersistentSet, frozenset(memo_key(item) for item in value))
+    elif is_vector(value):
+        return (type(value), value.dtype.str, value.tobytes())
+    else:
+        return (type(value), value)
+
+# Returns the name of an effectful builtin that fn (or a function it
+# calls by name) uses, if there is one
+def impure_call(fn, function_scope, seen: set):
+    body = fn.function.body if isinstance(fn, Closure) else fn.body
+
+    for form in body:
+        if isinstance(form, Function):
+            name = impure_call(form, function_scope, seen)
+        elif isinstance(form, (Variable, Deref)) and form.name in function_scope and form.name not in seen:
+            seen.add(form.name)
+            value = function_scope[form.name]
+
+            if not getattr(value, "pure", True):
+                return form.name
+            elif isinstance(value, (Function, Closure)) and not value.is_builtin:
+                name = impure_call(value, function_scope, seen)
+            else:
+                continue
+        else:
+            continue
 
-        stack.append(ls[n])
+        if name is not None:
+            return name
+
+    return None
+
+# A function that remembers the results of its last size calls. The key
+# is the arguments the function pops, so it's run on a stack of its own
+# and can't use anything else on the stack
+class Memoized(Builtin):
+    def __init__(self, fn, size: int):
+        super().__init__()
+        self.fn = fn
+        self.size = size
+        self.results = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __str__(self):
+        return f"{self.fn} memo"
+
+    def execute(self, stack, function_scope, variable_scope):
+        count = len(self.fn.args)
+
+        if len(stack) < count:
+            raise IndexError("pop from empty list")
+
+        args = stack[len(stack) - count:]
+        del stack[len(stack) - count:]
+        key = tuple(memo_key(arg) for arg in args)
+
+        if key in self.results:
+            self.hits += 1
+            self.results.move_to_end(key)
+            stack.extend(self.results[key])
+            return
+
+        self.misses += 1
+        result = list(args)
+        self.fn.execute(result, function_scope, variable_scope)
+        self.results[key] = tuple(result)
+
+        if len(self.results) > self.size:
+            self.results.popitem(last=False)
+            self.evictions += 1
+
+        stack.extend(result)
+
+    @staticmethod
+    def create(fn, size, function_scope) -> 'Memoized':
+        if not isinstance(fn, (Function, Closure)) or fn.is_builtin:
+            raise TypeError("Only Pancake functions can be memoized")
+        elif not isinstance(size, int) or size < 1:
+            raise TypeError("Memoized functions need to keep at least 1 result")
+
+        effect = impure_call(fn, function_scope, set())
+
+        if effect is not None:
+            raise ValueError(f"Cannot memoize a function that uses {effect}")
+
+        return Memoized(fn, size)
+
+class Memo(Builtin):
+    def execute(self, stack, function_scope, variable_scope):
+        fn = stack.pop()
+
+        stack.append(Memoized.create(fn, MEMO_SIZE, function_scope))
+
+# Same as memo, with the number of results to keep (&fib 100 memo-limit)
+class MemoLimit(Builtin):
+    def execute(self, stack, function_scope, variable_scope):
+        size = stack.pop()
+        fn = stack.pop()
+
+        stack.append(Memoized.create(fn, size, function_scope))
+
+# Pushes [ hits misses evictions results-kept size ] for a memoized function
+class MemoStats(Builtin):
+    def execute(self, stack, function_scope, variable_scope):
+        fn = stack.pop()
+
+        if not isinstance(fn, Memoized):
+            raise TypeError("memo-stats needs a memoized function")
+
+        stack.append(PersistentList.from_iterable([fn.hits, fn.misses, fn.evictions, len(fn.results), fn.size]))
+
+# VECTORS (NumPy arrays, the arithmetic and comparison builtins work on
+# them element by element since they just use Python's operators)
+
+class Vector(Builtin):
+    def execute(self, stack, function_scope, variable_scope):
+        ls = stack.pop()
+
+        stack.append(to_vector(ls))
+
+# Same as range, but makes a vector
+class VectorRange(Builtin):
+    def execute(self, stack, function_scope, variable_scope):
+        require_numpy()
+        end = stack.pop()
+        start = stack.pop()
+
+        stack.append(numpy.arange(start, end))
+
+class ToList(Builtin):
+    def execute(self, stack, function_scope, variable_scope):
+        ls = stack.pop()
+
+        stack.append(PersistentList.from_iterable(ls.tolist() if is_vector(ls) else ls))
+
+class Sum(Builtin):
+    def execute(self, stack, function_scope, variable_scope):
+        ls = stack.pop()
+
+        if is_vector(ls):
+            stack.append(to_python(ls.sum()))
+        else:
+            stack.append(sum(ls))
+
+class Dot(Builtin):
+    def execute(self, stack, function_scope, variable_scope):
+        b = to_vector(stack.pop())
+        a = to_vector(stack.pop())
+
+        stack.append(to_python(numpy.dot(a, b)))
+
+# Keeps the items of a vector where the mask (a vector of booleans,
+# e.g. from v 2 mod 0 eq) is true
+class Where(Builtin):
+    def execute(self, stack, function_scope, variable_scope):
+        mask = to_vector(stack.pop())
+        vector = to_vector(stack.pop())
+
+        if mask.dtype.kind != "b" or len(mask) != len(vector):
+            raise TypeError("where needs a vector of booleans the same length as the vector")
+
+        stack.append(vector[mask])
 
 FUNCTION_BUILTINS = {
     "exec": Execute(),
     "if": If(),
     "import": Import(),
+    "input": Input(),
     "print": Print(),
+    "flush": Flush(),
     "require": Require(),
     "stack": Stack(),
     "throw": Throw(),
     "try": Try(),
 
+    "lines": ReadLines(),
+    "read": Read(),
+    "write": Write(),
+    "append-file": AppendFile(),
+
     "and": And(),
     "not": Not(),
     "or": Or(),
@@ -297,5 +848,53 @@ FUNCTION_BUILTINS = {
 
     "append": Append(),
     "length": Length(),
-    "nth": Nth()
+    "nth": Nth(),
+
+    "get": Get(),
+    "assoc": Assoc(),
+    "dissoc": Dissoc(),
+    "has?": Has(),
+    "keys": Keys(),
+    "values": Values(),
+    "union": Union(),
+    "intersect": Intersect(),
+
+    "pmap": ParallelMap(),
+    "pfilter": ParallelFilter(),
+
+    "memo": Memo(),
+    "memo-limit": MemoLimit(),
+    "memo-stats": MemoStats(),
+
+    "vector": Vector(),
+    "vector-range": VectorRange(),
+    "to-list": ToList(),
+    "sum": Sum(),
+    "dot": Dot(),
+    "where": Where()
 }
+
+STDLIB_BUILTINS = {
+    "empty?": IsEmpty(),
+    "first": First(),
+    "slice": Slice(),
+    "rest": Rest(),
+    "range": Range(),
+    "for": For(),
+    "reverse": Reverse(),
+
+    "map": Map(),
+    "filter": Filter(),
+    "reject": Reject(),
+    "reduce": Reduce(),
+    "take": Take(),
+    "take-while": TakeWhile(),
+    "realize": Realize()
+}
+
+# Every builtin, as it was before any program ran
+ALL_BUILTINS = FUNCTION_BUILTINS | STDLIB_BUILTINS
+
+# Lets the profiler show builtins by name
+for name, builtin in ALL_BUILTINS.items():
+    builtin.name = name
@@ -0,0 +1,42 @@
+# Avoid circular imports
+import pancake.interpreter.vm as vm
+
+# A function literal evaluated inside another function's body. The body
+# and compiled code belong to the function and are shared by every closure
+# made from it, the closure only adds (a copy of) the frame it was
+# created in
+class Closure:
+    __slots__ = ("function", "env")
+
+    is_builtin = False
+
+    def __init__(self, function, env: list):
+        self.function = function
+        self.env = env
+
+    @property
+    def name(self):
+        return self.function.name
+
+    @property
+    def args(self):
+        return self.function.args
+
+    @property
+    def line(self):
+        return self.function.line
+
+    def __str__(self):
+        return str(self.function)
+
+    def raw(self):
+        return self.function.raw()
+
+    def compiled(self):
+        return self.function.code
+
+    def new_frame(self, stack) -> list:
+        return self.function.new_frame(stack, self.env)
+
+    def execute(self, stack, function_scope, variable_scope):
+        vm.run(self.function.code, stack, function_scope, variable_scope, self.new_frame(stack), self)
@@ -0,0 +1,79 @@
+from enum import IntEnum
+
+class Op(IntEnum):
+    # Push a literal (int, float, string, bool, symbol, list, global function)
+    PUSH_CONST = 0
+    # Push an argument/local of the current function from its frame
+    LOAD_FAST = 1
+    # Push an argument/local of an enclosing function, arg is (depth, slot)
+    LOAD_DEREF = 2
+    # Push a global variable, or call the function with that name
+    LOAD_NAME = 3
+    # Call a builtin
+    CALL_BUILTIN = 4
+    # Pop the top of the stack into a local/global variable or function
+    STORE_FAST = 5
+    STORE = 6
+    STORE_FN = 7
+    # Push a declared function (&name)
+    PUSH_FN = 8
+    # Push a function literal inside another function, linked to the
+    # current frame
+    MAKE_CLOSURE = 9
+    # LOAD_NAME/CALL_BUILTIN as the last instruction of a function body,
+    # the function called replaces the current one instead of nesting
+    TAIL_NAME = 10
+    TAIL_BUILTIN = 11
+    # Pop the top arg[0] items and push them back in the order given by
+    # the indexes in arg[1] (e.g. (2, (1, 0)) swaps, (1, ()) pops), used
+    # for inlined stack words
+    SHUFFLE = 12
+    # Call a function declared inside a function (=>name), which lives in
+    # a frame slot, arg is (depth, slot) like LOAD_DEREF. TAIL_LOCAL is
+    # the same as the last instruction of a function body
+    CALL_LOCAL = 13
+    TAIL_LOCAL = 14
+
+class Code:
+    __slots__ = ("instructions", "guards", "fallback", "calls", "native")
+
+    # guards are the (name, function) pairs of the functions the optimizer
+    # inlined into instructions, fallback is the code to run instead (with
+    # nothing inlined) if any of the names has been redefined since
+    def __init__(self, instructions, guards=(), fallback=None):
+        self.instructions = instructions
+        self.guards = guards
+        self.fallback = fallback
+        # Times the VM has run the instructions, and the Python function
+        # they were turned into once that got to jit.JIT_CALLS (see jit.py)
+        self.calls = 0
+        self.native = None
+
+    # The code to run given the functions defined now
+    def checked(self, function_scope) -> 'Code':
+        for name, func in self.guards:
+            if function_scope.get(name) is not func:
+                return self.fallback
+
+        return self
+
+    # Compiled code never changes once it's built, so copies of functions
+    # can share it
+    def __deepcopy__(self, memo):
+        return self
+
+    # Python functions can't be pickled, the code is compiled again in the
+    # process it's sent to if it gets run enough there
+    def __reduce__(self):
+        return Code, (self.instructions, self.guards, self.fallback)
+
+    def __str__(self):
+        lines = []
+
+        for index, (op, arg) in enumerate(self.instructions):
+            lines.append(f"{index:>4} {op.name:<12} {arg}")
+
+        if len(self.guards) > 0:
+            lines.append(f"     (not inlined if {', '.join(name for name, _ in self.guards)} is redefined)")
+
+        return "\n".join(lines)
@@ -1,3 +1,4 @@
+import sys
 from enum import Enum
 
 class DeclareType(Enum):
@@ -5,8 +6,10 @@ class DeclareType(Enum):
     FUNCTION = 1
 
 class Declare:
+    __slots__ = ("name", "declare_type")
+
     def __init__(self, name, declare_type):
-        self.name = name
+        self.name = sys.intern(name)
         self.declare_type = declare_type
 
     def __str__(self):
@@ -14,3 +17,9 @@ class Declare:
             return f"={self.name}"
         else:
             return f"=>{self.name}"
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
@@ -1,6 +1,16 @@
+import sys
+
 class Deref:
+    __slots__ = ("name",)
+
     def __init__(self, name):
-        self.name = name
+        self.name = sys.intern(name)
 
     def __str__(self):
         return f"&{self.name}"
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
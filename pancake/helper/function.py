@@ -1,46 +1,52 @@
-from copy import copy, deepcopy
-from typing import Tuple
+import itertools
+import sys
 
+from pancake.helper.closure import Closure
+from pancake.helper.code import Code
 from pancake.helper.declare import Declare
 from pancake.helper.variable import Variable
 
 # Avoid circular imports
-import pancake.interpreter.eval as evaluate
+import pancake.interpreter.compile as compiler
+import pancake.interpreter.vm as vm
 
 class Function:
-    ID = 0
-    CLOSURE_ID = 0
+    __slots__ = ("id", "args", "body", "slots", "parent_id", "parent", "line", "code", "name")
 
-    # Gives a function a unique ID (needed for function scoping)
+    IDS = itertools.count()
+
+    # Builtins are run by Python code instead of the VM
+    is_builtin = False
+
+    # Gives a function a unique ID (needed for function scoping), safe to
+    # call from more than one thread
     @staticmethod
     def new_id():
-        try:
-            return Function.ID
-        finally:
-            Function.ID += 1
-
-    # Gives a function a unique closure ID
-    # (needed for currying and referencing variables inside
-    # nested functions)
-    @staticmethod
-    def new_closure_id():
-        try:
-            return Function.CLOSURE_ID
-        finally:
-            Function.CLOSURE_ID += 1
+        return next(Function.IDS)
 
-    def __init__(self, args, body, parent_id=-1, closure=False):
+    # line is where the function starts in its source file (if it was read
+    # from one)
+    def __init__(self, args, body, parent_id=-1, line=None):
         self.id = Function.new_id()
+        self.args = [Function.scoped_name(self.id, arg) for arg in args]
+        self.body = Function.edited_body(self.id, args, body)
 
-        if closure:
-            self.args = args
-            self.body = body
-        else:
-            self.args = [f"{self.id}#{arg}" for arg in args]
-            self.body = Function.edited_body(self.id, args, body)
+        # edited_body adds every variable declared in the body to args, so
+        # each argument/local gets its own slot in the frame (slot 0 is the
+        # link to the frame the function was created in)
+        self.slots = {Function.scoped_name(self.id, name): slot for slot, name in enumerate(args, start=1)}
+
+        for item in self.body:
+            if isinstance(item, Function) and item.parent_id == self.id:
+                item.parent = self
 
         self.parent_id = parent_id
-        self.scope_updates = {}
+        self.parent = None
+        self.line = line
+        self.code = None
+        # Only set for builtins, the profiler keeps the names other
+        # functions were defined with itself (see Profiler.define)
+        self.name = None
 
     # Given the function's arguments and body, displays it
     # in a user-readable format
@@ -54,15 +60,10 @@ class Function:
             return f"{{ {args} : {body} }}"
 
     def __str__(self):
-        cleaned_args = []
-
-        for arg in self.args:
-            cleaned_args.append(Function.clean_name(arg))
-
-        cleaned_body = Function.clean_body(deepcopy(self.body))
-        body_string = " ".join(str(x) for x in cleaned_body)
+        cleaned_args = " ".join(Function.clean_name(arg) for arg in self.args)
+        body_string = " ".join(Function.clean_form(item) for item in self.body)
 
-        return Function.display(" ".join(cleaned_args), body_string)
+        return Function.display(cleaned_args, body_string)
 
     # Displays the "raw" version of a function, which basically
     # includes all "annotated" versions of argument/variable names
@@ -71,13 +72,35 @@ class Function:
         body_string = " ".join(x.raw() if isinstance(x, Function) else str(x) for x in self.body)
         return Function.display(" ".join(self.args), body_string)
 
+    # Compiles the body the first time the function is run
+    def compiled(self) -> 'Code':
+        if self.code is None:
+            self.code = compiler.compile_forms(self.body, self)
+
+        return self.code
+
+    # Wraps a function literal so it can see the variables of the frame it
+    # was created in (env is a copy, so it sees the values they had then)
+    def closure(self, env: list) -> Closure:
+        self.compiled()
+        return Closure(self, env)
+
+    # Makes a frame for a call to the function, popping its arguments
+    # off the stack, env is the frame the function was created in (None
+    # for functions that aren't closures)
+    def new_frame(self, stack, env: list = None) -> list:
+        frame = [None] * (len(self.slots) + 1)
+        frame[0] = env
+
+        for slot in range(len(self.args), 0, -1):
+            frame[slot] = stack.pop()
+
+        return frame
+
     # Executes the first function on the stack, given the current
-    # function/variable scope
+    # function scope and global variables
     def execute(self, stack, function_scope, variable_scope):
-        for arg in reversed(self.args):
-            variable_scope[arg] = stack.pop()
-        
-        self.scope_updates = evaluate.evaluate(self.body, stack, function_scope, variable_scope)
+        vm.run(self.compiled(), stack, function_scope, variable_scope, self.new_frame(stack), self)
 
     # Clean a symbol in a function, removing local variable stuff (e.g. 18#y -> y)
     @staticmethod
@@ -89,20 +112,22 @@ class Function:
         else:
             return split[1]
 
-    # Clean an entire function body
+    # Displays a form in a function body without its scope annotation
+    # (nested functions clean their own bodies)
     @staticmethod
-    def clean_body(body: list) -> list:
-        for index in range(len(body)):
-            item = body[index]
-
-            if isinstance(item, Variable):
-                body[index].name = Function.clean_name(item.name)
-            elif isinstance(item, Declare):
-                body[index].name = Function.clean_name(item.name)
-            elif isinstance(item, Function):
-                body[index].body = Function.clean_body(item.body)
+    def clean_form(item) -> str:
+        if isinstance(item, Variable):
+            return Function.clean_name(item.name)
+        elif isinstance(item, Declare):
+            return str(Declare(Function.clean_name(item.name), item.declare_type))
+        else:
+            return str(item)
 
-        return body
+    # Names are interned, so the same name in different places is the same
+    # string (which makes looking them up in dictionaries faster)
+    @staticmethod
+    def scoped_name(fid: int, name: str) -> str:
+        return sys.intern(f"{fid}#{name}")
 
     # Add little annotations to indicate the scope of various functions,
     # needed to make example/curry.pan and example/scoping.pan work properly
@@ -111,13 +136,14 @@ class Function:
         for index in range(len(body)):
             item = body[index]
 
+            # Forms are never changed, annotated ones replace them
             if isinstance(item, Variable) and item.name in args:
-                body[index].name = f"{fid}#{item.name}"
+                body[index] = Variable(Function.scoped_name(fid, item.name))
             elif isinstance(item, Declare) and not Function.is_argument(item.name):
                 if item.name not in args:
                     args.append(item.name)
 
-                body[index].name = f"{fid}#{item.name}"
+                body[index] = Declare(Function.scoped_name(fid, item.name), item.declare_type)
             elif isinstance(item, Function):
                 body[index].body = Function.edited_body(fid, args, item.body)
 
@@ -134,42 +160,7 @@ class Function:
     def is_argument(name: str) -> bool:
         return "#" in name
 
-    # Checks if the current variable is a closure argument
-    # (i.e. has an @ in it)
-    @staticmethod
-    def is_closure(name: str) -> bool:
-        return "@" in name
-
     # Returns the ID of the function the variable is from
     @staticmethod
     def fid_of_name(name: str) -> int:
-        if name[0] == "@":
-            return -1
-        else:
-            return int(name.split("#")[0])
-
-    # Makes a function a closure if necessary, changing the function's body
-    # to remove any local references to arguments, returning mappings
-    @staticmethod
-    def closureify(function: 'Function', parent_id) -> Tuple['Function', dict[str, str]]:
-        new_body = deepcopy(function.body)
-        mapping = {}
-
-        for i in range(len(new_body)):
-            symbol = new_body[i]
-
-            if isinstance(symbol, Variable) \
-                and Function.is_argument(symbol.name) \
-                and Function.fid_of_name(symbol.name) == parent_id:
-                clean = Function.clean_name(symbol.name)
-                closure_name = f"@{Function.new_closure_id()}#{clean}"
-
-                mapping[closure_name] = symbol.name
-                new_body[i].name = closure_name
-            elif isinstance(symbol, Function):
-                closure, closure_mapping = Function.closureify(symbol, parent_id)
-                mapping |= closure_mapping
-                new_body[i] = closure
-
-        result = Function(function.args, new_body, function.parent_id, closure=True)
-        return result, mapping
+        return int(name.split("#")[0])
@@ -0,0 +1,30 @@
+import os
+
+# The lines of a file (without their line endings), read a line at a time
+# every time they're gone through, so a file of any size only ever has
+# one line of it in memory. The file is read again from the start each
+# time, like a list it can be gone through as many times as needed
+class Lines:
+    __slots__ = ("path",)
+
+    def __init__(self, path: str):
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"No such file: {path}")
+
+        self.path = path
+
+    def __iter__(self):
+        with open(self.path) as f:
+            for line in f:
+                yield line.rstrip("\r\n")
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return f"lines[ {self.path} ]"
+
+    __str__ = __repr__
@@ -1,2 +1,6 @@
 class PancakeError(Exception):
     pass
+
+# Raised when code goes over one of the limits its Interpreter was given
+class LimitError(PancakeError):
+    pass
@@ -0,0 +1,160 @@
+from pancake.helper.vector import MIXED_ADD, is_vector, list_ufunc
+
+BITS = 5
+WIDTH = 1 << BITS
+MASK = WIDTH - 1
+
+# Immutable list with structural sharing (a 32-way trie plus a "tail" leaf,
+# like Clojure's vectors). append/nth are O(log32 n), and appending never
+# changes the original list, so lists never have to be copied
+class PersistentList:
+    __slots__ = ("count", "shift", "root", "tail")
+
+    def __init__(self, count=0, shift=BITS, root=(), tail=()):
+        self.count = count
+        self.shift = shift
+        self.root = root
+        self.tail = tail
+
+    @staticmethod
+    def from_iterable(items) -> 'PersistentList':
+        items = list(items)
+        count = len(items)
+
+        if count <= WIDTH:
+            return PersistentList(count, BITS, (), tuple(items))
+
+        # Everything except the last 1-32 items goes into full leaves, which
+        # are grouped 32 at a time until there's a single root
+        tail_offset = ((count - 1) >> BITS) << BITS
+        nodes = [tuple(items[i:i + WIDTH]) for i in range(0, tail_offset, WIDTH)]
+        shift = BITS
+
+        while len(nodes) > WIDTH:
+            nodes = [tuple(nodes[i:i + WIDTH]) for i in range(0, len(nodes), WIDTH)]
+            shift += BITS
+
+        return PersistentList(count, shift, tuple(nodes), tuple(items[tail_offset:]))
+
+    # Index of the first item in the tail
+    def tail_offset(self) -> int:
+        if self.count < WIDTH:
+            return 0
+        else:
+            return ((self.count - 1) >> BITS) << BITS
+
+    def append(self, item) -> 'PersistentList':
+        # Room left in the tail, only the tail needs to be copied
+        if self.count - self.tail_offset() < WIDTH:
+            return PersistentList(self.count + 1, self.shift, self.root, self.tail + (item,))
+
+        # Tail is full, push it into the tree and start a new one
+        if (self.count >> BITS) > (1 << self.shift):
+            root = (self.root, PersistentList.new_path(self.shift, self.tail))
+            shift = self.shift + BITS
+        else:
+            root = self.push_tail(self.shift, self.root, self.tail)
+            shift = self.shift
+
+        return PersistentList(self.count + 1, shift, root, (item,))
+
+    @staticmethod
+    def new_path(level: int, node: tuple) -> tuple:
+        if level == 0:
+            return node
+        else:
+            return (PersistentList.new_path(level - BITS, node),)
+
+    def push_tail(self, level: int, parent: tuple, tail: tuple) -> tuple:
+        index = ((self.count - 1) >> level) & MASK
+
+        if level == BITS:
+            inserted = tail
+        elif index < len(parent):
+            inserted = self.push_tail(level - BITS, parent[index], tail)
+        else:
+            inserted = PersistentList.new_path(level - BITS, tail)
+
+        return parent[:index] + (inserted,) + parent[index + 1:]
+
+    def __getitem__(self, index):
+        if not isinstance(index, int):
+            raise TypeError(f"list indices must be integers, not {type(index).__name__}")
+
+        if index < 0:
+            index += self.count
+
+        if index < 0 or index >= self.count:
+            raise IndexError("list index out of range")
+
+        if index >= self.tail_offset():
+            return self.tail[index & MASK]
+
+        node = self.root
+
+        for level in range(self.shift, 0, -BITS):
+            node = node[(index >> level) & MASK]
+
+        return node[index & MASK]
+
+    def __len__(self):
+        return self.count
+
+    @staticmethod
+    def leaves(node: tuple, level: int):
+        if level == 0:
+            yield node
+        else:
+            for child in node:
+                yield from PersistentList.leaves(child, level - BITS)
+
+    def __iter__(self):
+        if self.root:
+            for leaf in PersistentList.leaves(self.root, self.shift):
+                yield from leaf
+
+        yield from self.tail
+
+    # Adding a list and a vector is refused whichever way round they are
+    # (see list_ufunc)
+    def __add__(self, other):
+        if is_vector(other):
+            raise TypeError(MIXED_ADD)
+
+        result = self
+
+        for item in other:
+            result = result.append(item)
+
+        return result
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        return list_ufunc(ufunc, method, inputs, kwargs)
+
+    def __eq__(self, other):
+        # Anything else (e.g. a Seq) gets to compare itself
+        if not isinstance(other, (PersistentList, list)):
+            return NotImplemented
+
+        if len(self) != len(other):
+            return False
+
+        return all(a == b for a, b in zip(self, other))
+
+    # Nothing inside ever changes, so lists can be keys of maps (as long as
+    # their items can be)
+    def __hash__(self):
+        return hash(tuple(self))
+
+    # Copies can share everything too
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    # Printed the same way Python lists are when nested inside other lists
+    def __repr__(self):
+        return repr(list(self))
+
+    __str__ = __repr__
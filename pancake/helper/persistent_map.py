@@ -0,0 +1,393 @@
+from pancake.helper.persistent_list import PersistentList
+from pancake.helper.vector import is_vector
+
+BITS = 5
+MASK = (1 << BITS) - 1
+# Bits of a key's hash used, keys whose hashes match in all of them end up
+# in the same Collision node
+HASH_BITS = 64
+HASH_MASK = (1 << HASH_BITS) - 1
+
+# Keys that are compared by their type and Python value
+PLAIN = frozenset((int, float, str, bool))
+
+# What a key is hashed and compared by: its type as well as its value, all
+# the way down, so 1, 1.0 and true (which Python sees as the same) are
+# different keys, and so are [ 1 ] and [ 1.0 ]
+def key_of(key):
+    kind = type(key)
+
+    if kind in PLAIN:
+        return kind, key
+    elif kind is PersistentList:
+        return kind, tuple(key_of(item) for item in key)
+    elif kind is PersistentMap:
+        return kind, frozenset((key_of(item), key_of(value)) for item, value in key.items())
+    elif kind is PersistentSet:
+        return kind, frozenset(key_of(item) for item in key)
+    elif is_vector(key):
+        raise TypeError("Vectors can't be used as keys, turn them into a list with to-list first")
+    else:
+        return kind, key
+
+def hash_of(key) -> int:
+    # Keys that are the same by key_of are always equal in Python, so
+    # their hashes match
+    if type(key) in PLAIN:
+        return hash(key) & HASH_MASK
+
+    return hash(key_of(key)) & HASH_MASK
+
+def same_key(a, b) -> bool:
+    if a is b:
+        return True
+    elif type(a) in PLAIN:
+        return type(a) is type(b) and a == b
+    else:
+        return key_of(a) == key_of(b)
+
+# Stands in for a key that isn't there
+MISSING = object()
+
+# Number of bits set (int.bit_count is only in Python 3.10 and up)
+if hasattr(int, "bit_count"):
+    popcount = int.bit_count
+else:
+    def popcount(n: int) -> int:
+        return bin(n).count("1")
+
+# Items in a Bitmap node before the one for bit
+def index_of(bitmap: int, bit: int) -> int:
+    return popcount(bitmap & (bit - 1))
+
+# The keys (and values) in a Bitmap node are split up by BITS bits of their
+# hash at a time, a bit in bitmap being set for each piece that something
+# uses. entries only has room for the bits that are set, each entry being
+# a (key, value) pair or (if several keys share the piece) another node
+class Bitmap:
+    __slots__ = ("bitmap", "entries")
+
+    def __init__(self, bitmap: int, entries: tuple):
+        self.bitmap = bitmap
+        self.entries = entries
+
+    def get(self, key, key_hash: int, shift: int, default):
+        bit = 1 << ((key_hash >> shift) & MASK)
+
+        if not self.bitmap & bit:
+            return default
+
+        entry = self.entries[index_of(self.bitmap, bit)]
+
+        if type(entry) is tuple:
+            return entry[1] if same_key(entry[0], key) else default
+
+        return entry.get(key, key_hash, shift + BITS, default)
+
+    # Returns the new node and whether the key is new. Only the nodes on
+    # the way to the key are copied, everything else is shared
+    def assoc(self, key, value, key_hash: int, shift: int) -> tuple:
+        bit = 1 << ((key_hash >> shift) & MASK)
+        index = index_of(self.bitmap, bit)
+        entries = self.entries
+
+        if not self.bitmap & bit:
+            return Bitmap(self.bitmap | bit, entries[:index] + ((key, value),) + entries[index:]), True
+
+        entry = entries[index]
+
+        if type(entry) is tuple:
+            if same_key(entry[0], key):
+                if entry[1] is value:
+                    return self, False
+
+                replacement, added = (key, value), False
+            else:
+                replacement, added = split(entry[0], entry[1], key, value, key_hash, shift + BITS), True
+        else:
+            replacement, added = entry.assoc(key, value, key_hash, shift + BITS)
+
+            if replacement is entry:
+                return self, False
+
+        return Bitmap(self.bitmap, entries[:index] + (replacement,) + entries[index + 1:]), added
+
+    # Returns the new node (self if the key isn't there, None if nothing's
+    # left)
+    def dissoc(self, key, key_hash: int, shift: int):
+        bit = 1 << ((key_hash >> shift) & MASK)
+
+        if not self.bitmap & bit:
+            return self
+
+        index = index_of(self.bitmap, bit)
+        entries = self.entries
+        entry = entries[index]
+
+        if type(entry) is tuple:
+            if not same_key(entry[0], key):
+                return self
+
+            replacement = None
+        else:
+            replacement = entry.dissoc(key, key_hash, shift + BITS)
+
+            if replacement is entry:
+                return self
+
+            # A node with just one pair left is swapped for the pair, so
+            # there's only ever one way to lay the same keys out
+            if replacement is not None and len(replacement.entries) == 1 and type(replacement.entries[0]) is tuple:
+                replacement = replacement.entries[0]
+
+        if replacement is not None:
+            return Bitmap(self.bitmap, entries[:index] + (replacement,) + entries[index + 1:])
+        elif len(entries) == 1:
+            return None
+        else:
+            return Bitmap(self.bitmap ^ bit, entries[:index] + entries[index + 1:])
+
+    def items(self):
+        for entry in self.entries:
+            if type(entry) is tuple:
+                yield entry
+            else:
+                yield from entry.items()
+
+# Keys whose whole hashes are the same, looked through one at a time
+class Collision:
+    __slots__ = ("entries",)
+
+    def __init__(self, entries: tuple):
+        self.entries = entries
+
+    def find(self, key) -> int:
+        for index, (other, _) in enumerate(self.entries):
+            if same_key(other, key):
+                return index
+
+        return -1
+
+    def get(self, key, key_hash: int, shift: int, default):
+        index = self.find(key)
+        return default if index < 0 else self.entries[index][1]
+
+    def assoc(self, key, value, key_hash: int, shift: int) -> tuple:
+        index = self.find(key)
+
+        if index < 0:
+            return Collision(self.entries + ((key, value),)), True
+        elif self.entries[index][1] is value:
+            return self, False
+        else:
+            return Collision(self.entries[:index] + ((key, value),) + self.entries[index + 1:]), False
+
+    def dissoc(self, key, key_hash: int, shift: int):
+        index = self.find(key)
+
+        if index < 0:
+            return self
+        elif len(self.entries) == 1:
+            return None
+        else:
+            return Collision(self.entries[:index] + self.entries[index + 1:])
+
+    def items(self):
+        return iter(self.entries)
+
+# A node holding two keys that were in the same place one level up
+def split(key, value, other_key, other_value, other_hash: int, shift: int):
+    if shift >= HASH_BITS:
+        return Collision(((key, value), (other_key, other_value)))
+
+    key_hash = hash_of(key)
+    bit = 1 << ((key_hash >> shift) & MASK)
+    other_bit = 1 << ((other_hash >> shift) & MASK)
+
+    if bit == other_bit:
+        return Bitmap(bit, (split(key, value, other_key, other_value, other_hash, shift + BITS),))
+    elif bit < other_bit:
+        return Bitmap(bit | other_bit, ((key, value), (other_key, other_value)))
+    else:
+        return Bitmap(bit | other_bit, ((other_key, other_value), (key, value)))
+
+# Immutable hash map (a hash array mapped trie, like Clojure's maps). Keys
+# can be anything that can be hashed (numbers, strings, symbols, lists...).
+# get/assoc/dissoc look at one node for every BITS bits of the key's hash
+# (almost always one or two), and assoc/dissoc only copy those nodes, so
+# the original map never changes and never has to be copied
+class PersistentMap:
+    __slots__ = ("count", "root")
+
+    def __init__(self, count=0, root=None):
+        self.count = count
+        self.root = root
+
+    @staticmethod
+    def from_items(items) -> 'PersistentMap':
+        result = PersistentMap()
+
+        for key, value in items:
+            result = result.assoc(key, value)
+
+        return result
+
+    # The same as root.get, but without a Python call for every level
+    def get(self, key, default=None):
+        node = self.root
+
+        if node is None:
+            return default
+
+        key_hash = hash_of(key)
+        shift = 0
+
+        while type(node) is Bitmap:
+            bit = 1 << ((key_hash >> shift) & MASK)
+            bitmap = node.bitmap
+
+            if not bitmap & bit:
+                return default
+
+            node = node.entries[popcount(bitmap & (bit - 1))]
+
+            if type(node) is tuple:
+                return node[1] if same_key(node[0], key) else default
+
+            shift += BITS
+
+        return node.get(key, key_hash, shift, default)
+
+    def assoc(self, key, value) -> 'PersistentMap':
+        root = Bitmap(0, ()) if self.root is None else self.root
+        root, added = root.assoc(key, value, hash_of(key), 0)
+
+        if root is self.root:
+            return self
+
+        return PersistentMap(self.count + 1 if added else self.count, root)
+
+    def dissoc(self, key) -> 'PersistentMap':
+        if self.root is None:
+            return self
+
+        root = self.root.dissoc(key, hash_of(key), 0)
+
+        if root is self.root:
+            return self
+
+        return PersistentMap(self.count - 1, root)
+
+    def items(self):
+        return iter(()) if self.root is None else self.root.items()
+
+    def keys(self):
+        return (key for key, _ in self.items())
+
+    def values(self):
+        return (value for _, value in self.items())
+
+    def __contains__(self, key):
+        return self.get(key, MISSING) is not MISSING
+
+    def __getitem__(self, key):
+        value = self.get(key, MISSING)
+
+        if value is MISSING:
+            raise KeyError(key)
+
+        return value
+
+    def __len__(self):
+        return self.count
+
+    # Like Python dictionaries, going through a map gives its keys
+    def __iter__(self):
+        return self.keys()
+
+    def __eq__(self, other):
+        if not isinstance(other, PersistentMap):
+            return NotImplemented
+
+        return self.count == other.count and all(other.get(key, MISSING) == value for key, value in self.items())
+
+    def __hash__(self):
+        return hash(frozenset(self.items()))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    # Hashes change between processes, so maps are sent to other processes
+    # (and saved in the parse cache) as their items
+    def __reduce__(self):
+        return PersistentMap.from_items, (tuple(self.items()),)
+
+    def __repr__(self):
+        items = " ".join(f"{key} {value}" for key, value in self.items())
+        return f"map[ {items} ]"
+
+    __str__ = __repr__
+
+# Immutable hash set, a PersistentMap from each item to itself
+class PersistentSet:
+    __slots__ = ("map",)
+
+    def __init__(self, map=None):
+        self.map = PersistentMap() if map is None else map
+
+    @staticmethod
+    def from_iterable(items) -> 'PersistentSet':
+        result = PersistentMap()
+
+        for item in items:
+            result = result.assoc(item, item)
+
+        return PersistentSet(result)
+
+    def get(self, item, default=None):
+        return self.map.get(item, default)
+
+    # Same as append on a list
+    def append(self, item) -> 'PersistentSet':
+        result = self.map.assoc(item, item)
+        return self if result is self.map else PersistentSet(result)
+
+    def dissoc(self, item) -> 'PersistentSet':
+        result = self.map.dissoc(item)
+        return self if result is self.map else PersistentSet(result)
+
+    def __contains__(self, item):
+        return item in self.map
+
+    def __len__(self):
+        return len(self.map)
+
+    def __iter__(self):
+        return self.map.keys()
+
+    def __eq__(self, other):
+        if not isinstance(other, PersistentSet):
+            return NotImplemented
+
+        return len(self) == len(other) and all(item in other for item in self)
+
+    def __hash__(self):
+        return hash(frozenset(self))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return PersistentSet.from_iterable, (tuple(self),)
+
+    def __repr__(self):
+        items = " ".join(str(item) for item in self)
+        return f"set[ {items} ]"
+
+    __str__ = __repr__
@@ -0,0 +1,293 @@
+import itertools
+import weakref
+
+from pancake.helper.persistent_list import PersistentList
+from pancake.helper.vector import list_ufunc
+
+# Stages of a pipeline
+MAP = 0
+FILTER = 1
+REJECT = 2
+TAKE = 3
+TAKE_WHILE = 4
+
+# Stands in for the end of a Seq
+END = object()
+# Stands in for an item that hasn't been taken from the source yet
+NOTHING = object()
+
+# An item of a Seq that has been worked out. next is the Cell after it, END
+# after the last item, or (until the next item is needed) the Pending that
+# works out the rest
+class Cell:
+    __slots__ = ("item", "next")
+
+    def __init__(self, item, next):
+        self.item = item
+        self.next = next
+
+# The items of a Seq that haven't been worked out yet: a stage and where
+# it's up to in its source (the Cell of the Seq it was made from it last
+# took an item from, or an iterator over a range/lines/list)
+class Pending:
+    __slots__ = ("source", "kind", "arg", "function_scope", "variable_scope", "held")
+
+    def __init__(self, source, kind: int, arg, function_scope, variable_scope):
+        self.source = source
+        self.kind = kind
+        # fn, or the number of items left for a take
+        self.arg = arg
+        self.function_scope = function_scope
+        self.variable_scope = variable_scope
+        # Taken from the source but not through the stage yet, so if fn
+        # throws the same item is tried again next time
+        self.held = NOTHING
+
+    def next_source(self):
+        source = self.source
+
+        if type(source) is not Cell:
+            return next(source, END)
+
+        cell = advance(source)
+
+        if cell is END:
+            return END
+
+        self.source = cell
+        return cell.item
+
+    # The next item of the Seq, or END
+    def pull(self):
+        kind = self.kind
+
+        if kind == TAKE:
+            if self.arg <= 0:
+                return END
+
+            item = self.next_source()
+            self.arg -= 1
+            return item
+
+        while True:
+            item = self.held
+
+            if item is NOTHING:
+                item = self.held = self.next_source()
+
+                if item is END:
+                    return END
+
+            stack = [item]
+            self.arg.execute(stack, self.function_scope, self.variable_scope)
+            result = stack.pop()
+            self.held = NOTHING
+
+            if kind == MAP:
+                return result
+            elif kind == FILTER:
+                if result:
+                    return item
+            elif kind == REJECT:
+                if not result:
+                    return item
+            else:
+                return item if result else END
+
+# The Cell after cell (or END), working it out if it hasn't been yet
+def advance(cell):
+    following = cell.next
+
+    if type(following) is Pending:
+        item = following.pull()
+
+        if item is END:
+            cell.next = END
+            return END
+
+        following = cell.next = Cell(item, following)
+
+    return following
+
+# Goes through the items after cell, only holding on to the current one
+def items_after(cell):
+    while True:
+        cell = advance(cell)
+
+        if cell is END:
+            return
+
+        yield cell.item
+
+# A lazy sequence: a range, the lines of a file or a list with a map,
+# filter, take... stage on top of it (or on top of another Seq). Adding a
+# stage makes a new Seq without running anything, items are worked out one
+# at a time as they're needed. Like lazy seqs in Clojure, each item is only
+# ever worked out once: they're kept in a chain of Cells that the Seq holds
+# the start of, so going through it again (or getting an item by its
+# index) uses the ones already there. A Seq that nothing holds on to lets
+# go of each item once it's been gone past, so a whole pipeline only ever
+# has an item or so of each stage in memory. Seqs without a stage just go
+# through their source again, which has no side effects
+class Seq:
+    __slots__ = ("source", "head", "items", "last", "count", "__weakref__")
+
+    def __init__(self, source=None, head=None):
+        # Seqs without a stage have a source, the rest have a head (a Cell
+        # with no item, before the first one)
+        self.source = source
+        self.head = head
+        # Items gone past by index so far and the Cell of the last one,
+        # only made if the Seq is indexed
+        self.items = None
+        self.last = None
+        # Number of items, once they've all been worked out
+        self.count = None
+
+    def then(self, kind: int, arg, function_scope=None, variable_scope=None) -> 'Seq':
+        source = iter(self.source) if self.head is None else self.head
+        return Seq(head=Cell(None, Pending(source, kind, arg, function_scope, variable_scope)))
+
+    def __iter__(self):
+        if self.head is None:
+            return iter(self.source)
+
+        return items_after(self.head)
+
+    def realize(self) -> PersistentList:
+        return PersistentList.from_iterable(self)
+
+    # Goes as far as the item at index (or the end, if index is None)
+    def index_to(self, index):
+        if self.items is None:
+            self.items = []
+            self.last = self.head
+
+        items = self.items
+
+        while index is None or len(items) <= index:
+            cell = advance(self.last)
+
+            if cell is END:
+                self.count = len(items)
+                return
+
+            items.append(cell.item)
+            self.last = cell
+
+    # Ranges (and lists) without any stages know their length and items
+    # already, everything else is worked out once and kept
+    def __len__(self):
+        if self.count is None:
+            if self.head is None and hasattr(self.source, "__len__"):
+                return len(self.source)
+            elif self.head is None:
+                return sum(1 for _ in self.source)
+
+            self.index_to(None)
+
+        return self.count
+
+    def __getitem__(self, index):
+        if not isinstance(index, int):
+            raise TypeError(f"list indices must be integers, not {type(index).__name__}")
+
+        if self.head is None and hasattr(self.source, "__getitem__"):
+            return self.source[index]
+        elif self.head is None:
+            return self.realize()[index]
+
+        self.index_to(None if index < 0 else index)
+
+        if -len(self.items) <= index < len(self.items):
+            return self.items[index]
+
+        raise IndexError("list index out of range")
+
+    def append(self, item) -> PersistentList:
+        return self.realize().append(item)
+
+    def __add__(self, other):
+        return self.realize() + other
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        return list_ufunc(ufunc, method, inputs, kwargs)
+
+    def __eq__(self, other):
+        if not isinstance(other, (Seq, PersistentList, list)):
+            return NotImplemented
+
+        sentinel = object()
+        return all(a == b for a, b in itertools.zip_longest(self, other, fillvalue=sentinel))
+
+    __hash__ = None
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    # Sent to other processes (by pmap) as the list it turns into
+    def __reduce__(self):
+        return PersistentList.from_iterable, (list(self),)
+
+    # Only shows the items that have been worked out already, working out
+    # the rest could mean running Pancake functions outside of the
+    # interpreter (print goes through the items itself)
+    def __repr__(self):
+        if self.head is None:
+            return repr(list(self.source)) if isinstance(self.source, (range, PersistentList)) else "[...]"
+
+        items = []
+        cell = self.head
+
+        while type(cell.next) is Cell:
+            cell = cell.next
+            items.append(repr(cell.item))
+
+        if cell.next is not END:
+            items.append("...")
+
+        return f"[{', '.join(items)}]"
+
+    __str__ = __repr__
+
+# stack.pop() as a list. A Seq is only held on to by the iterator going
+# through it, so if nothing else is holding on to it either, its items are
+# let go of as they're added to the list instead of being kept until the end
+def pop_list(stack) -> PersistentList:
+    if not isinstance(stack[-1], Seq):
+        return stack.pop()
+
+    return PersistentList.from_iterable(iter(stack.pop()))
+
+# len(stack.pop()), but if nothing else is holding on to the Seq its items
+# are let go of as they're counted, instead of being kept until the end
+def pop_length(stack) -> int:
+    seq = stack.pop()
+
+    if not isinstance(seq, Seq) or seq.head is None or seq.count is not None or seq.items is not None:
+        return len(seq)
+
+    cell = seq.head
+    held = weakref.ref(seq)
+    del seq
+
+    count = 0
+
+    while True:
+        cell = advance(cell)
+
+        if cell is END:
+            break
+
+        count += 1
+
+    # Still worth knowing if something is holding on to it
+    seq = held()
+
+    if seq is not None:
+        seq.count = count
+
+    return count
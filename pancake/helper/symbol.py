@@ -1,3 +1,28 @@
+import sys
+
 class Symbol:
+    __slots__ = ("name",)
+
     def __init__(self, name):
-        self.name = name
+        self.name = sys.intern(name)
+
+    # Names are interned, so this is almost always just a pointer comparison
+    def __eq__(self, other):
+        return isinstance(other, Symbol) and (self.name is other.name or self.name == other.name)
+
+    def __hash__(self):
+        return hash((Symbol, self.name))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    # Rebuilt with the constructor so names loaded from the parse cache (or
+    # sent to another process) are interned again
+    def __reduce__(self):
+        return Symbol, (self.name,)
+
+    def __repr__(self):
+        return f":{self.name}"
@@ -0,0 +1,31 @@
+from enum import Enum
+
+class TokenType(Enum):
+    FUNCTION_START = 0
+    FUNCTION_END = 1
+    LIST_START = 2
+    LIST_END = 3
+    STRING = 4
+    INT = 5
+    FLOAT = 6
+    COMMENT = 7
+    MAP_START = 9
+    SET_START = 10
+    # Everything else (names, declarations, symbols, true/false...)
+    WORD = 8
+
+class Token:
+    # Source files can have millions of these
+    __slots__ = ("type", "text", "line", "column")
+
+    def __init__(self, token_type, text, line, column):
+        self.type = token_type
+        self.text = text
+        self.line = line
+        self.column = column
+
+    def position(self) -> str:
+        return f"line {self.line}, column {self.column}"
+
+    def __str__(self):
+        return self.text
@@ -1,6 +1,18 @@
+import sys
+
+# Forms never change once they've been read (functions replace them
+# instead), so copies can share them
 class Variable:
+    __slots__ = ("name",)
+
     def __init__(self, name):
-        self.name = name
+        self.name = sys.intern(name)
 
     def __str__(self):
         return self.name
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
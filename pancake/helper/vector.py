@@ -0,0 +1,47 @@
+# NumPy is optional, everything else works without it and vectors raise
+# an ImportError when they're used
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def require_numpy():
+    if numpy is None:
+        raise ImportError("Vectors need NumPy, install it with pip install numpy")
+
+def is_vector(value) -> bool:
+    return numpy is not None and isinstance(value, numpy.ndarray)
+
+MIXED_ADD = "Can't add a list and a vector, make them both lists (to-list) or both vectors (vector) first"
+
+# What NumPy does when a list (or Seq) is used with a vector. list + vector
+# joins them, so vector + list adding their items would give + two meanings
+# depending on the order, it's refused both ways instead. Anything else
+# works on the items of the list, the same as it would on its own
+def list_ufunc(ufunc, method, inputs: tuple, kwargs: dict):
+    if ufunc is numpy.add:
+        raise TypeError(MIXED_ADD)
+
+    inputs = [value if isinstance(value, numpy.ndarray) or not hasattr(type(value), "__array_ufunc__")
+              else numpy.array(list(value)) for value in inputs]
+
+    return getattr(ufunc, method)(*inputs, **kwargs)
+
+# Vectors only hold numbers (or booleans, from comparisons), so arithmetic
+# on them can always be done by NumPy
+def to_vector(items):
+    require_numpy()
+    vector = numpy.array(items if is_vector(items) else list(items))
+
+    if vector.ndim != 1 or vector.dtype.kind not in "biuf":
+        raise TypeError("Vectors can only be made from lists of numbers")
+
+    return vector
+
+# NumPy scalars (from indexing or summing a vector) are turned back into
+# regular numbers so they print and compare like any other number
+def to_python(value):
+    if numpy is not None and isinstance(value, numpy.generic):
+        return value.item()
+    else:
+        return value
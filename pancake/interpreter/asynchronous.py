@@ -0,0 +1,189 @@
+import asyncio
+import threading
+import weakref
+
+from pancake.interpreter.buffer import OutputBuffer
+from pancake.interpreter.interpreter import Interpreter
+
+# Instructions a script runs before it lets the other scripts on the loop
+# have a turn
+STEPS = 10_000
+# Most scripts on a loop with a thread at once, the rest wait to start
+# until one of them finishes
+MAX_THREADS = 256
+
+# Sends what print writes to an async callback, a line at a time
+class LineWriter:
+    def __init__(self, interpreter, callback):
+        self.interpreter = interpreter
+        self.callback = callback
+        self.pending = ""
+
+    def write(self, text: str) -> int:
+        self.pending += text
+
+        if "\n" in self.pending:
+            end = self.pending.rindex("\n") + 1
+            lines, self.pending = self.pending[:end], self.pending[end:]
+            self.interpreter.call(self.callback(lines))
+
+        return len(text)
+
+    def flush(self):
+        if self.pending:
+            text, self.pending = self.pending, ""
+            self.interpreter.call(self.callback(text))
+
+# Only one script runs at a time on each loop (the rest are waiting for
+# their turn), so the loop never has to fight lots of threads for the GIL
+schedulers = weakref.WeakKeyDictionary()
+
+def scheduler(loop) -> asyncio.Lock:
+    if loop not in schedulers:
+        schedulers[loop] = asyncio.Lock()
+
+    return schedulers[loop]
+
+# Each script needs a thread of its own, these limit how many a loop has
+thread_slots = weakref.WeakKeyDictionary()
+
+def threads(loop) -> asyncio.Semaphore:
+    if loop not in thread_slots:
+        thread_slots[loop] = asyncio.Semaphore(MAX_THREADS)
+
+    return thread_slots[loop]
+
+# An Interpreter that can be awaited from an asyncio event loop. Code runs
+# on a thread of its own, but only while it has the loop's turn: every
+# steps instructions it gives the turn to the next script waiting for
+# one, so a long-running script never blocks the loop and any number of
+# scripts can share it fairly. output and input are async callbacks,
+# output(text) gets what the code prints (whole lines, apart from input
+# prompts) and input(prompt) returns a line. They're awaited on the loop
+# without holding the turn, so slow I/O doesn't hold other scripts up.
+# Only MAX_THREADS scripts on a loop have started at once, so a script
+# shouldn't wait (e.g. in input) on one that was started after it
+class AsyncInterpreter(Interpreter):
+    def __init__(self, native_stdlib=True, optimize=True, profiler=None, file_name=None,
+                 output=None, input=None, limits=None, image=None, jit=True, steps=STEPS):
+        super().__init__(native_stdlib, optimize, profiler, file_name, limits=limits, image=image, jit=jit)
+
+        if output is not None:
+            self.output = LineWriter(self, output)
+            self.buffer = OutputBuffer(self.output)
+
+        self.read_callback = input
+        self.slice = steps
+        # Step count the current turn ends at
+        self.turn_ends = 0
+
+        self.loop = None
+        # The thread stops by setting turn to what it wants next ("pause",
+        # "call" with a coroutine to await, or "done"), and waits for
+        # resume. reply is the (result, error) of the last call
+        self.turn = None
+        self.resume = None
+        self.reply = None
+        self.cancelled = False
+        # Only one eval at a time, the others wait
+        self.busy = asyncio.Lock()
+
+    # Awaits a coroutine on the loop from the code's thread
+    def call(self, coroutine):
+        self.hand_over("call", coroutine)
+        result, error = self.reply
+
+        if error is not None:
+            raise error
+
+        return result
+
+    def read_line(self, prompt: str) -> str:
+        if self.read_callback is None:
+            return super().read_line(prompt)
+
+        self.buffer.flush()
+        return self.call(self.read_callback(prompt)).rstrip("\n")
+
+    def checkpoint(self):
+        if self.steps >= self.turn_ends:
+            self.turn_ends = self.steps + self.slice
+            self.hand_over("pause")
+
+        super().checkpoint()
+
+    def next_checkpoint(self):
+        return min(super().next_checkpoint(), self.turn_ends)
+
+    # Stops the thread until the loop gives it another turn
+    def hand_over(self, action: str, value=None):
+        # Nobody is left to hand over to (e.g. flushing after a cancel)
+        if self.cancelled:
+            raise asyncio.CancelledError()
+
+        self.loop.call_soon_threadsafe(AsyncInterpreter.wake, self.turn, (action, value))
+        self.wait_for_turn()
+
+    def wait_for_turn(self):
+        self.resume.acquire()
+
+        if self.cancelled:
+            raise asyncio.CancelledError()
+
+    @staticmethod
+    def wake(turn, request: tuple):
+        # Nobody is waiting any more if the eval was cancelled
+        if not turn.done():
+            turn.set_result(request)
+
+    def run_thread(self, forms, outcome: dict):
+        try:
+            self.wait_for_turn()
+            outcome["stack"] = Interpreter.eval(self, forms)
+        except BaseException as e:
+            outcome["error"] = e
+        finally:
+            self.loop.call_soon_threadsafe(AsyncInterpreter.wake, self.turn, ("done", None))
+
+    async def eval(self, forms) -> list:
+        async with self.busy, threads(asyncio.get_running_loop()):
+            self.loop = asyncio.get_running_loop()
+            self.resume = threading.Semaphore(0)
+            self.cancelled = False
+            self.turn_ends = self.steps + self.slice
+            self.check_at = self.next_checkpoint()
+
+            outcome = {}
+            thread = threading.Thread(target=self.run_thread, args=(forms, outcome), daemon=True)
+            thread.start()
+
+            try:
+                while True:
+                    async with scheduler(self.loop):
+                        self.turn = self.loop.create_future()
+                        self.resume.release()
+                        action, value = await self.turn
+
+                    if action == "done":
+                        break
+                    elif action == "call":
+                        try:
+                            self.reply = (await value, None)
+                        except Exception as e:
+                            self.reply = (None, e)
+            except asyncio.CancelledError:
+                # The thread stops as soon as it's waiting for a turn
+                self.cancelled = True
+                self.resume.release()
+                await self.loop.run_in_executor(None, thread.join)
+                raise
+
+            thread.join()
+
+            if "error" in outcome:
+                raise outcome["error"]
+
+            return outcome["stack"]
+
+    async def run(self, code) -> list:
+        return await self.eval(Interpreter.READ(code))
@@ -0,0 +1,54 @@
+import sys
+
+# Characters of output kept before they're written out
+BUFFER_SIZE = 1 << 16
+
+# Collects what print writes and passes it on to target in big chunks,
+# instead of making a write (and, for stdout, a flush) for every call.
+# target is None for stdout, which is looked up when it's written to so
+# sys.stdout can still be redirected. Terminals get each write straight
+# away, so interactive programs look the same as before
+class OutputBuffer:
+    __slots__ = ("target", "size", "parts", "length", "interactive")
+
+    def __init__(self, target=None, size=BUFFER_SIZE):
+        self.target = target
+        self.size = size
+        self.parts = []
+        self.length = 0
+        # Worked out on the first write
+        self.interactive = None
+
+    def stream(self):
+        return sys.stdout if self.target is None else self.target
+
+    def write(self, text: str):
+        self.parts.append(text)
+        self.length += len(text)
+
+        if self.interactive is None:
+            isatty = getattr(self.stream(), "isatty", None)
+            self.interactive = isatty is not None and isatty()
+
+        if self.length >= self.size or self.interactive:
+            self.drain()
+
+    # Writes out everything buffered so far
+    def drain(self):
+        if self.length > 0:
+            text = "".join(self.parts)
+            self.parts.clear()
+            self.length = 0
+
+            self.stream().write(text)
+
+    # Same as drain, but target is flushed as well (so it all shows up)
+    def flush(self):
+        self.drain()
+        stream = self.stream()
+
+        if hasattr(stream, "flush"):
+            stream.flush()
+
+# Used outside of an interpreter, where nothing would flush a buffer
+UNBUFFERED = OutputBuffer(size=0)
@@ -0,0 +1,68 @@
+import hashlib
+import os
+import pickle
+import threading
+
+import pancake
+
+CACHE_DIR = "__pancache__"
+# Changed whenever the classes that make up forms change, so caches written
+# with the old classes aren't loaded
+FORMAT = 3
+
+# Parsed forms are stored in __pancache__/ next to the source file, the
+# same way Python stores .pyc files in __pycache__/
+def cache_path(file_name: str) -> str:
+    directory, base = os.path.split(os.path.abspath(file_name))
+    return os.path.join(directory, CACHE_DIR, f"{base}.pancake-{pancake.__version__}-{FORMAT}.pickle")
+
+# Hashes the file a chunk at a time, so big files aren't read into
+# memory all at once
+def file_hash(file_name: str) -> str:
+    sha = hashlib.sha256()
+
+    with open(file_name, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+
+    return sha.hexdigest()
+
+# Everything that has to match for a cached parse to be reused
+def cache_key(file_name: str) -> tuple:
+    return (
+        os.path.abspath(file_name),
+        os.stat(file_name).st_mtime_ns,
+        file_hash(file_name),
+        pancake.__version__,
+        FORMAT
+    )
+
+# Returns the cached forms for a file, or None if there aren't any
+# (or they're out of date)
+def load(file_name: str, key: tuple):
+    try:
+        with open(cache_path(file_name), "rb") as f:
+            cached_key, forms = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError, AttributeError, ImportError):
+        return None
+
+    if cached_key != key:
+        return None
+
+    return forms
+
+def store(file_name: str, key: tuple, forms):
+    path = cache_path(file_name)
+
+    # Not being able to write the cache (e.g. read-only directory) only
+    # means the file gets parsed again next time
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+        with open(temp_path, "wb") as f:
+            pickle.dump((key, forms), f, pickle.HIGHEST_PROTOCOL)
+
+        os.replace(temp_path, path)
+    except OSError:
+        pass
@@ -0,0 +1,118 @@
+from pancake.helper.code import Code, Op
+from pancake.helper.declare import Declare, DeclareType
+from pancake.helper.deref import Deref
+from pancake.helper.variable import Variable
+
+# Avoid circular import errors
+import pancake.helper.function as function
+import pancake.interpreter.vm as vm
+
+# Checks the functions of the interpreter doing the compiling (so native
+# stdlib functions count once they've replaced the Pancake ones)
+def is_builtin(name: str) -> bool:
+    # Imported here since builtins.py depends on the interpreter
+    from pancake.helper.builtins import Builtin, FUNCTION_BUILTINS
+
+    interpreter = vm.current.get()
+    function_scope = FUNCTION_BUILTINS if interpreter is None else interpreter.function_scope
+
+    return isinstance(function_scope.get(name), Builtin)
+
+# Finds the frame slot of an annotated (fid#name) variable, returning how
+# many frames up it is, its slot and the function it belongs to
+def resolve(name: str, func) -> tuple:
+    fid = function.Function.fid_of_name(name)
+    depth = 0
+
+    while func is not None:
+        if func.id == fid:
+            return depth, func.slots[name], func
+
+        func = func.parent
+        depth += 1
+
+    raise NameError(f"Undefined symbol {name}")
+
+# Whether a local was declared with =>name, so using it calls it instead of
+# pushing it
+def is_local_function(name: str, func) -> bool:
+    return any(isinstance(item, Declare) and item.name == name and item.declare_type == DeclareType.FUNCTION
+               for item in func.body)
+
+def compile_form(form, func):
+    if isinstance(form, Declare):
+        # Functions declared inside a function are locals like any other
+        if func is not None and function.Function.is_argument(form.name):
+            return (Op.STORE_FAST, func.slots[form.name])
+        elif form.declare_type == DeclareType.FUNCTION:
+            return (Op.STORE_FN, form.name)
+        else:
+            return (Op.STORE, form.name)
+    elif isinstance(form, Deref):
+        return (Op.PUSH_FN, form.name)
+    elif isinstance(form, Variable):
+        if func is not None and function.Function.is_argument(form.name):
+            depth, slot, owner = resolve(form.name, func)
+
+            if is_local_function(form.name, owner):
+                return (Op.CALL_LOCAL, (depth, slot))
+            elif depth == 0:
+                return (Op.LOAD_FAST, slot)
+            else:
+                return (Op.LOAD_DEREF, (depth, slot))
+        elif is_builtin(form.name):
+            return (Op.CALL_BUILTIN, form.name)
+        else:
+            return (Op.LOAD_NAME, form.name)
+    elif isinstance(form, function.Function):
+        if func is None:
+            return (Op.PUSH_CONST, form)
+        else:
+            return (Op.MAKE_CLOSURE, form)
+    else:
+        return (Op.PUSH_CONST, form)
+
+# Turns a list of forms (from Interpreter.READ) into a flat list
+# of instructions for the VM, func is the function the forms are the
+# body of (None for top-level code)
+def compile_forms(forms, func=None) -> Code:
+    instructions = []
+
+    for form in forms:
+        # Comments
+        if form is None:
+            continue
+
+        instructions.append(compile_form(form, func))
+
+    interpreter = vm.current.get()
+    optimizer = None if interpreter is None else interpreter.optimizer
+
+    if optimizer is None:
+        return Code(mark_tail_calls(instructions, func))
+
+    if func is None:
+        optimizer.declare(forms)
+
+    optimized, guards = optimizer.optimize(instructions, func)
+
+    if len(guards) == 0:
+        return Code(mark_tail_calls(optimized, func))
+
+    # Run instead if an inlined function gets redefined
+    fallback, _ = optimizer.optimize(instructions, func, inline=False)
+    return Code(mark_tail_calls(optimized, func), guards, Code(mark_tail_calls(fallback, func)))
+
+# Calls at the end of a function body are tail calls
+def mark_tail_calls(instructions: list, func) -> list:
+    if func is not None and len(instructions) > 0:
+        op, arg = instructions[-1]
+
+        if op == Op.LOAD_NAME:
+            instructions[-1] = (Op.TAIL_NAME, arg)
+        elif op == Op.CALL_BUILTIN:
+            instructions[-1] = (Op.TAIL_BUILTIN, arg)
+        elif op == Op.CALL_LOCAL:
+            instructions[-1] = (Op.TAIL_LOCAL, arg)
+
+    return instructions
@@ -1,36 +1,289 @@
-from pancake.helper.builtins import FUNCTION_BUILTINS
-from pancake.helper.declare import Declare, DeclareType
+import io
+import math
+import os
+import threading
+from contextlib import contextmanager
+
+from pancake.helper.builtins import FUNCTION_BUILTINS, STDLIB_BUILTINS
+from pancake.helper.closure import Closure
+from pancake.helper.code import Op
 from pancake.helper.function import Function
-from pancake.helper.reader import Reader
-from pancake.helper.variable import Variable
 
-from pancake.interpreter.read import tokenise, read_form
-from pancake.interpreter.eval import evaluate
+import pancake.interpreter.cache as cache
+from pancake.interpreter.buffer import OutputBuffer
+from pancake.interpreter.compile import compile_forms
+from pancake.interpreter.limits import MIN_CHECK_STEPS
+from pancake.interpreter.modules import ModuleRegistry, ROOT_DIR
+from pancake.interpreter.optimize import Optimizer
+from pancake.interpreter.read import tokenise, read_forms
+import pancake.interpreter.vm as vm
 
+# Each Interpreter has its own functions, variables, stack and imported
+# modules, so any number of them can run at once in different threads
+# (code in one can't see or change anything in another). Definitions are
+# kept between runs, so code run later can use functions defined earlier
 class Interpreter:
+    # Warm interpreters made by image(), by (native_stdlib, optimize)
+    images = {}
+    images_lock = threading.Lock()
+
+    # native_stdlib swaps the list functions in the stdlib for the Python
+    # versions in STDLIB_BUILTINS (turn it off to check them against
+    # the Pancake versions), profiler is a Profiler that records every
+    # call, file_name is where the code came from (imports are looked up
+    # next to it), output is where print writes to and input is where
+    # input reads lines from (None for stdout/stdin), limits is what each
+    # run is allowed to use (see Limits). image is an interpreter to start
+    # off from instead of an empty one (native_stdlib and optimize come
+    # from it), see clone. jit turns code that's run a lot into Python (see
+    # jit.py)
+    def __init__(self, native_stdlib=True, optimize=True, profiler=None, file_name=None, output=None, input=None,
+                 limits=None, image=None, jit=True):
+        self.native_stdlib = native_stdlib
+        self.optimizer = Optimizer() if optimize else None
+        self.profiler = profiler
+        self.output = output
+        self.input = input
+        # What print writes goes through here on its way to output, it's
+        # flushed after every run
+        self.buffer = OutputBuffer(output)
+        self.limits = limits
+        self.jit = jit
+
+        # Instructions run so far, the VM calls checkpoint once there have
+        # been check_at of them
+        self.steps = 0
+        self.check_at = math.inf
+        # Bookkeeping for limits: steps when the current run started, how
+        # deep its calls are, how far apart checks are and the memory used
+        # at the last one (and the step count then)
+        self.run_start = 0
+        self.depth = 0
+        self.check_steps = MIN_CHECK_STEPS
+        self.memory_used = 0
+        self.memory_checked = 0
+
+        # Files imported by the code run so far
+        self.modules = ModuleRegistry(file_name)
+
+        self.stack = []
+        self.function_scope = dict(FUNCTION_BUILTINS)
+        self.variable_scope = {}
+        self.stdlib_loaded = False
+
+        # Only one thread can run code in an interpreter at a time
+        self.lock = threading.RLock()
+
+        if image is not None:
+            self.copy_state(image)
+
+        # Functions defined before the profiler was there are shown by name
+        # as well
+        if profiler is not None:
+            for name, value in self.function_scope.items():
+                profiler.define(name, value)
+
+    # Takes the definitions, stack and optimizer of another interpreter.
+    # The containers are copied (a few hundred pointers, nothing is read
+    # or evaluated again), the values in them are shared since Pancake
+    # values are never changed
+    def copy_state(self, image: 'Interpreter'):
+        with image.lock:
+            self.native_stdlib = image.native_stdlib
+            self.optimizer = None if image.optimizer is None else image.optimizer.copy()
+            self.stack = list(image.stack)
+            self.function_scope = dict(image.function_scope)
+            self.variable_scope = dict(image.variable_scope)
+            self.stdlib_loaded = image.stdlib_loaded
+
+    # A new interpreter that starts off with everything defined in this
+    # one, nothing it defines shows up here (or in other clones)
+    def clone(self, profiler=None, file_name=None, output=None, input=None, limits=None, jit=True) -> 'Interpreter':
+        return Interpreter(profiler=profiler, file_name=file_name, output=output, input=input, limits=limits,
+                           image=self, jit=jit)
+
+    # Compiles every function defined so far (and the functions inside
+    # them), so clones share the finished code instead of each one
+    # compiling it with what it has defined itself
+    def compile_all(self):
+        with self.running():
+            remaining = [value.function if isinstance(value, Closure) else value
+                         for value in self.function_scope.values() if not value.is_builtin]
+
+            while len(remaining) > 0:
+                func = remaining.pop()
+                remaining.extend(arg for _, arg in func.compiled().instructions if isinstance(arg, Function))
+
+    # An interpreter with the stdlib loaded, made once and shared (it's
+    # only ever cloned, never run)
+    @staticmethod
+    def image(native_stdlib=True, optimize=True) -> 'Interpreter':
+        key = (native_stdlib, optimize)
+
+        with Interpreter.images_lock:
+            if key not in Interpreter.images:
+                image = Interpreter(native_stdlib, optimize)
+                image.load_stdlib()
+                image.compile_all()
+                Interpreter.images[key] = image
+
+            return Interpreter.images[key]
+
+    # The interpreter running code in this thread, if there is one
+    @staticmethod
+    def current() -> 'Interpreter':
+        return vm.current.get()
+
+    # Makes this the interpreter that builtins (and the compiler) see
+    # while the body of the with statement runs
+    @contextmanager
+    def running(self):
+        with self.lock:
+            token = vm.current.set(self)
+
+            try:
+                yield self
+            finally:
+                vm.current.reset(token)
+
+    # code can be a string or anything that gives back lines of code
+    # (e.g. an open file)
     @staticmethod
     def READ(code):
-        tokens = list(filter(len, tokenise(code)))
-        reader = Reader(tokens)
-        forms = []
+        if isinstance(code, str):
+            code = io.StringIO(code)
 
-        while reader.position < len(reader.tokens):
-            forms.append(read_form(reader))
+        return list(read_forms(tokenise(code)))
+
+    # Reads a file, reusing the forms parsed last time if the file
+    # hasn't changed since
+    @staticmethod
+    def READ_FILE(file_name, use_cache=True):
+        if use_cache:
+            key = cache.cache_key(file_name)
+            forms = cache.load(file_name, key)
+
+            if forms is not None:
+                return forms
+
+        with open(file_name) as f:
+            forms = Interpreter.READ(f)
+
+        if use_cache:
+            cache.store(file_name, key, forms)
 
         return forms
 
+    # Turns top-level forms into bytecode for the VM
     @staticmethod
-    def EVAL(forms):
-        stack = []
-        function_scope = FUNCTION_BUILTINS
-        variable_scope = {}
+    def COMPILE(forms):
+        return compile_forms(forms)
 
-        # stdlib implementation
-        with open("./stdlib/core.pan") as f:
-            evaluate(Interpreter.READ(f.read()), stack, function_scope, variable_scope, is_global=True)
+    # Reads and compiles stdlib/core.pan
+    @staticmethod
+    def STDLIB():
+        return Interpreter.COMPILE(Interpreter.READ_FILE(os.path.join(ROOT_DIR, "stdlib", "core.pan")))
 
-        evaluate(forms, stack, function_scope, variable_scope, is_global=True)
+    # Called by the VM once steps gets to check_at
+    def checkpoint(self):
+        if self.limits is not None:
+            self.limits.check(self)
+
+        self.check_at = self.next_checkpoint()
+
+    def start_run(self):
+        self.run_start = self.steps
+        self.check_steps = MIN_CHECK_STEPS
+        self.memory_used = 0
+        self.memory_checked = self.steps
+        self.check_at = self.next_checkpoint()
+
+    # Step count the VM should next call checkpoint at
+    def next_checkpoint(self):
+        return math.inf if self.limits is None else self.limits.next_check(self)
+
+    # Used by the input builtin
+    def read_line(self, prompt: str) -> str:
+        self.buffer.flush()
+
+        if self.input is None:
+            return input(prompt)
+
+        self.buffer.write(prompt)
+        self.buffer.flush()
+        return self.input.readline().rstrip("\n")
+
+    def load_stdlib(self):
+        with self.running():
+            if self.stdlib_loaded:
+                return
+
+            vm.run(Interpreter.STDLIB(), self.stack, self.function_scope, self.variable_scope)
+            self.stdlib_loaded = True
+
+            if self.native_stdlib:
+                self.function_scope |= STDLIB_BUILTINS
+
+                if self.optimizer is not None:
+                    self.optimizer.replace(STDLIB_BUILTINS)
+
+    # Runs forms, returning the stack afterwards. forms are compiled after
+    # the stdlib, so the optimizer can inline stdlib functions into them
+    def eval(self, forms) -> list:
+        with self.running():
+            self.load_stdlib()
+
+            self.start_run()
+
+            try:
+                vm.run(Interpreter.COMPILE(forms), self.stack, self.function_scope, self.variable_scope)
+            finally:
+                self.buffer.flush()
+
+        return self.stack
+
+    # code can be anything READ takes
+    def run(self, code) -> list:
+        return self.eval(Interpreter.READ(code))
+
+    # Bytecode for some code and every function in it, as it would be
+    # run by eval (for debugging the compiler/optimizer)
+    def dump(self, code) -> str:
+        with self.running():
+            self.load_stdlib()
+
+            sections = []
+            remaining = [("<top level>", Interpreter.COMPILE(Interpreter.READ(code)))]
+
+            while len(remaining) > 0:
+                name, compiled = remaining.pop(0)
+                sections.append(f"{name}:\n{compiled}")
+
+                for index, (op, arg) in enumerate(compiled.instructions):
+                    if isinstance(arg, Function):
+                        following = compiled.instructions[index + 1:index + 2]
+
+                        if following and following[0][0] == Op.STORE_FN:
+                            label = f"{following[0][1]} (line {arg.line})"
+                        else:
+                            label = f"<lambda line {arg.line}>"
+
+                        remaining.append((label, arg.compiled()))
+
+            return "\n\n".join(sections)
+
+    # Runs forms in an interpreter of their own (a clone of the warm image,
+    # so the stdlib doesn't have to be loaded every time)
+    @staticmethod
+    def EVAL(forms, native_stdlib=True, file_name=None, profiler=None, optimize=True, limits=None, jit=True) -> list:
+        image = Interpreter.image(native_stdlib, optimize)
+        return image.clone(profiler, file_name, limits=limits, jit=jit).eval(forms)
+
+    @staticmethod
+    def DUMP(code, native_stdlib=True, optimize=True) -> str:
+        return Interpreter.image(native_stdlib, optimize).clone().dump(code)
 
     @staticmethod
-    def interpret(code):
-        Interpreter.EVAL(Interpreter.READ(code))
+    def interpret(code, native_stdlib=True, file_name=None, profiler=None, optimize=True, limits=None,
+                  jit=True) -> list:
+        return Interpreter.EVAL(Interpreter.READ(code), native_stdlib, file_name, profiler, optimize, limits, jit)
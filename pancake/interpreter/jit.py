@@ -0,0 +1,403 @@
+import itertools
+
+from pancake.helper.code import Op
+
+# Avoid circular import errors
+import pancake.interpreter.vm as vm
+
+# Times a piece of code is run by the VM before it's turned into Python
+JIT_CALLS = 100
+
+# Returned by compiled code when a builtin it has inlined has been
+# replaced, so the VM runs the instructions instead
+FALLBACK = object()
+
+# Builtins written out as Python expressions, a is the item below the top
+# of the stack and b the top one (the same order the builtins pop them in)
+BINARY = {
+    "+": "{a} + {b}",
+    "-": "{a} - {b}",
+    "*": "{a} * {b}",
+    "/": "{a} / {b}",
+    "mod": "{a} % {b}",
+    "<": "{a} < {b}",
+    "<=": "{a} <= {b}",
+    ">": "{a} > {b}",
+    ">=": "{a} >= {b}",
+    "eq": "{a} == {b}",
+    "and": "{b} and {a}",
+    "or": "{b} or {a}"
+}
+
+UNARY = {
+    "not": "not {a}"
+}
+
+# Calls at the end of the body of an if that isn't at the end of the code
+# aren't tail calls
+NOT_TAIL = {
+    Op.TAIL_NAME: Op.LOAD_NAME,
+    Op.TAIL_BUILTIN: Op.CALL_BUILTIN,
+    Op.TAIL_LOCAL: Op.CALL_LOCAL
+}
+
+# Turns the instructions of a piece of code into the body of a Python
+# function, which does the same thing to the stack and frame. Values are
+# kept in Python variables instead of being pushed until something else
+# needs them on the stack (a call, or the end of the body), so { n : n 1 + }
+# becomes push(frame[1] + 1). Anything that could throw pushes what's
+# below its arguments first, so the stack is the same as it would have been
+# in the VM if it does. An if given two function literals becomes a Python
+# if with their bodies written out in it, so
+# { n : {: n 1 - f } {: 0 } n 0 eq if } doesn't make any closures or go
+# through the VM to run a branch. Calls to functions that are already
+# compiled (in function_scope, the functions defined when the code is
+# compiled) call their Python function straight away, as long as the name
+# still means the same function
+class Translator:
+    def __init__(self, code, function_scope=None):
+        self.code = code
+        self.function_scope = {} if function_scope is None else function_scope
+        self.lines = []
+        # Python expressions for the values that haven't been pushed yet,
+        # bottom first. They have no side effects, so they can be used
+        # whenever (or never)
+        self.pending = []
+        # Values used by the code, by the names they're given
+        self.constants = {}
+        # Builtins that have been inlined and functions whose bodies have
+        # been written out (by name), which have to be checked before the
+        # code runs
+        self.checks = {}
+        self.temps = itertools.count()
+        self.temp_names = set()
+        # Closures that haven't been made yet (by temp name), the function
+        # and the frame they'd be made with. They're only made when they
+        # end up being used for something other than an if
+        self.closures = {}
+        # How deeply nested in if statements the lines being written are
+        self.indent = 1
+
+    def emit(self, line: str):
+        self.lines.append("    " * self.indent + line)
+
+    def constant(self, value) -> str:
+        # Written straight into the code when it looks the same in Python
+        if type(value) in (int, bool, str) or (type(value) is float and repr(value) not in ("inf", "-inf", "nan")):
+            return repr(value)
+
+        name = f"k{len(self.constants)}"
+        self.constants[name] = value
+        return name
+
+    def temp_name(self) -> str:
+        name = f"t{next(self.temps)}"
+        self.temp_names.add(name)
+        return name
+
+    # Stores an expression in a new variable, so it's worked out now
+    def temp(self, expression: str) -> str:
+        name = self.temp_name()
+        self.emit(f"{name} = {expression}")
+        return name
+
+    # Expression that makes a closure that hasn't been made yet
+    def closure(self, value: str) -> str:
+        function, frame = self.closures[value]
+        return f"{self.constant(function)}.closure({frame})"
+
+    # Makes the closures that haven't been made yet out of values
+    def make_closures(self, values):
+        for value in values:
+            if value in self.closures:
+                self.emit(f"{value} = {self.closure(value)}")
+                del self.closures[value]
+
+    # Pushes everything that hasn't been pushed yet (or everything but the
+    # top keep values)
+    def flush(self, keep: int = 0):
+        count = len(self.pending) - keep
+        self.make_closures(self.pending[:count])
+
+        # A value worked out on the line before (and not needed again) is
+        # pushed straight away
+        last = self.lines[-1] if len(self.lines) > 0 else ""
+        prefix = "    " * self.indent
+
+        if count == 1 and self.pending[0] in self.temp_names and last.startswith(f"{prefix}{self.pending[0]} = ") \
+                and self.pending[0] not in self.pending[1:]:
+            self.lines[-1] = f"{prefix}push({last.split(' = ', 1)[1]})"
+        elif count == 1:
+            self.emit(f"push({self.pending[0]})")
+        elif count > 1:
+            self.emit(f"stack.extend(({', '.join(self.pending[:count])},))")
+
+        del self.pending[:count]
+
+    # Expression for the top value, popping it if it was pushed
+    def take(self) -> str:
+        if len(self.pending) > 0:
+            value = self.pending.pop()
+            self.make_closures([value])
+            return value
+
+        return self.temp("pop()")
+
+    # The values below the arguments stay in variables, they're only pushed
+    # if the builtin throws (so the stack is what it would be in the VM)
+    def builtin(self, name: str, template: str, count: int):
+        self.checks[name] = vm_builtin(name)
+
+        b = self.take()
+        a = self.take() if count == 2 else None
+        expression = template.format(a=a, b=b) if count == 2 else template.format(a=b)
+
+        if len(self.pending) == 0:
+            self.pending.append(self.temp(expression))
+            return
+
+        # Closures are made there and then, they're made again later on if
+        # it doesn't throw
+        below = [self.closure(value) if value in self.closures else value for value in self.pending]
+
+        result = self.temp_name()
+
+        self.emit("try:")
+        self.emit(f"    {result} = {expression}")
+        self.emit("except BaseException:")
+        self.emit(f"    stack.extend(({', '.join(below)},))")
+        self.emit("    raise")
+
+        self.pending.append(result)
+
+    def translate(self) -> str:
+        self.body(self.code.instructions, 0, True)
+        self.flush()
+
+        lines = ["def compiled(stack, frame, function_scope, variable_scope, interpreter):"]
+
+        for name, value in self.checks.items():
+            check = self.constant(value)
+            lines.append(f"    if function_scope.get({name!r}) is not {check}:")
+            lines.append("        return FALLBACK")
+
+        # Only looked up if they're used, most code is short
+        if any("push(" in line for line in self.lines):
+            lines.append("    push = stack.append")
+
+        if any("pop()" in line for line in self.lines):
+            lines.append("    pop = stack.pop")
+
+        # Empty code still needs a body
+        if len(lines) == 1 and len(self.lines) == 0:
+            lines.append("    pass")
+
+        return "\n".join(lines + self.lines)
+
+    # Writes out instructions that are level function literals deep (the
+    # bodies of ifs that have been written out), tail is whether the last
+    # one is a tail call (it isn't if the if they're in isn't)
+    def body(self, instructions, level: int, tail: bool):
+        for op, arg in instructions:
+            if not tail:
+                op = NOT_TAIL.get(op, op)
+
+            if op == Op.PUSH_CONST:
+                self.pending.append(self.constant(arg))
+            elif op == Op.LOAD_FAST:
+                self.pending.append(f"frame[{arg}]")
+            elif op == Op.LOAD_DEREF:
+                self.pending.append(local(arg[0] - level, arg[1]))
+            elif op == Op.STORE_FAST:
+                value = self.take()
+
+                # Values read from the slot (or closures made with the
+                # frame) before now keep the old value
+                self.make_closures(self.pending)
+                self.pending = [self.temp(item) if item == f"frame[{arg}]" else item for item in self.pending]
+                self.emit(f"frame[{arg}] = {value}")
+            elif op == Op.SHUFFLE:
+                self.shuffle(*arg)
+            elif op == Op.MAKE_CLOSURE:
+                name = self.temp_name()
+                # The frame of a function literal is a list of just the
+                # frame it was made in, since it has no arguments or locals
+                self.closures[name] = (arg, "[" * level + "frame[:]" + "]" * level)
+                self.pending.append(name)
+            elif op in (Op.CALL_BUILTIN, Op.TAIL_BUILTIN) and arg == "if" and self.branches() is not None:
+                self.branch(level, op == Op.TAIL_BUILTIN)
+            # A builtin at the end of the code is the same as any other once
+            # it's written out
+            elif op in (Op.CALL_BUILTIN, Op.TAIL_BUILTIN) and arg in BINARY:
+                self.builtin(arg, BINARY[arg], 2)
+            elif op in (Op.CALL_BUILTIN, Op.TAIL_BUILTIN) and arg in UNARY:
+                self.builtin(arg, UNARY[arg], 1)
+            else:
+                self.flush()
+                self.call(op, arg if op not in (Op.CALL_LOCAL, Op.TAIL_LOCAL) else (arg[0] - level, arg[1]))
+
+    # The (false, true) functions an if is given, if they're both function
+    # literals that can be written out
+    def branches(self):
+        # Imported here since function.py depends on the VM
+        from pancake.helper.function import Function
+
+        if len(self.pending) < 3:
+            return None
+
+        functions = []
+
+        for value in self.pending[-3:-1]:
+            if value in self.closures:
+                function = self.closures[value][0]
+            elif isinstance(self.constants.get(value), Function):
+                function = self.constants[value]
+            else:
+                return None
+
+            # Anything with its own arguments or locals needs a frame
+            if len(function.slots) > 0:
+                return None
+
+            functions.append(function)
+
+        return functions
+
+    def branch(self, level: int, tail: bool):
+        false, true = self.branches()
+        self.checks["if"] = vm_builtin("if")
+
+        predicate = self.pending.pop()
+        del self.pending[-2:]
+        self.flush()
+
+        for keyword, function in (("if", true), ("else", false)):
+            code = function.compiled()
+            self.checks.update(code.guards)
+
+            self.emit(f"{keyword} {predicate}:" if keyword == "if" else "else:")
+            self.indent += 1
+            start = len(self.lines)
+
+            self.body(code.instructions, level + 1, tail)
+            self.flush()
+
+            if len(self.lines) == start:
+                self.emit("pass")
+
+            self.indent -= 1
+
+    def shuffle(self, count: int, indexes: tuple):
+        # Everything is already in variables
+        if len(self.pending) >= count:
+            values = self.pending[len(self.pending) - count:]
+            del self.pending[len(self.pending) - count:]
+            self.pending.extend(values[index] for index in indexes)
+            return
+
+        # Same as the VM, nothing is popped if there aren't enough items
+        self.flush()
+        self.emit(f"if len(stack) < {count}:")
+        self.emit("    raise IndexError(\"pop from empty list\")")
+
+        values = [self.temp("pop()") for _ in range(count)][::-1]
+        self.pending.extend(values[index] for index in indexes)
+
+    # Instructions that need the stack as the VM would have it
+    def call(self, op, arg):
+        name = repr(arg) if isinstance(arg, str) else None
+
+        if op == Op.CALL_BUILTIN:
+            self.emit(f"function_scope[{name}].execute(stack, function_scope, variable_scope)")
+        elif op == Op.LOAD_NAME:
+            self.emit(f"if {name} in variable_scope:")
+            self.emit(f"    stack.append(variable_scope[{name}])")
+            self.direct(arg)
+            self.emit(f"elif {name} in function_scope:")
+            self.emit(f"    function_scope[{name}].execute(stack, function_scope, variable_scope)")
+            self.emit("else:")
+            self.emit(f"    raise NameError(\"Undefined symbol \" + {name})")
+        elif op == Op.TAIL_BUILTIN:
+            self.emit(f"return function_scope[{name}]")
+        elif op == Op.TAIL_NAME:
+            self.emit(f"if {name} in variable_scope:")
+            self.emit(f"    stack.append(variable_scope[{name}])")
+            self.emit("    return None")
+            self.emit(f"return tail_name({name}, function_scope)")
+        elif op == Op.STORE:
+            self.emit(f"store({name}, stack, function_scope, variable_scope)")
+        elif op == Op.STORE_FN:
+            self.emit(f"store_fn({name}, stack, function_scope, variable_scope)")
+        elif op == Op.PUSH_FN:
+            self.emit(f"push_fn({name}, stack, function_scope)")
+        elif op == Op.CALL_LOCAL:
+            self.emit(f"{local(*arg)}.execute(stack, function_scope, variable_scope)")
+        elif op == Op.TAIL_LOCAL:
+            self.emit(f"return {local(*arg)}")
+        else:
+            raise ValueError(f"Can't compile {op.name}")
+
+    # Does what Function.execute and the VM would do to call a function
+    # whose code has been compiled, without going through either of them.
+    # Interpreters with limits go the long way round, the VM keeps track
+    # of how deep the calls are for them
+    def direct(self, name: str):
+        # Imported here since function.py depends on the VM
+        from pancake.helper.function import Function
+
+        func = self.function_scope.get(name)
+
+        # Functions with something inlined into them have to be checked
+        # by the VM first
+        if type(func) is not Function or func.code is None or len(func.code.guards) > 0:
+            return
+
+        function = self.constant(func)
+        code = self.constant(func.code)
+
+        self.emit(f"elif function_scope.get({name!r}) is {function} and {code}.native is not None "
+                  "and interpreter.limits is None:")
+        self.indent += 1
+
+        # Popped in the same order as new_frame pops them
+        args = [self.temp("pop()") for _ in func.args][::-1]
+        frame = self.temp(f"[{', '.join(['None'] + args + ['None'] * (len(func.slots) - len(args)))}]")
+
+        self.emit(f"steps = interpreter.steps + {len(func.code.instructions)}")
+        self.emit("interpreter.steps = steps")
+        self.emit("if steps >= interpreter.check_at:")
+        self.emit("    interpreter.checkpoint()")
+
+        result = self.temp(f"{code}.native(stack, {frame}, function_scope, variable_scope, interpreter)")
+        self.emit(f"if {result} is not None:")
+        self.emit(f"    finish({result}, {code}, {frame}, {function}, stack, function_scope, variable_scope)")
+        self.indent -= 1
+
+# Expression for a slot of the frame depth frames up
+def local(depth: int, slot: int) -> str:
+    return "frame" + "[0]" * depth + f"[{slot}]"
+
+def vm_builtin(name: str):
+    # Imported here since builtins.py depends on the interpreter
+    from pancake.helper.builtins import FUNCTION_BUILTINS
+    return FUNCTION_BUILTINS[name]
+
+# Python source for the code (for debugging)
+def source(code, function_scope=None) -> str:
+    return Translator(code, function_scope).translate()
+
+# Turns code into a Python function, which the VM calls instead of running
+# its instructions from then on. label is used for the file name in
+# tracebacks
+def compile_code(code, function_scope=None, label: str = "<pancake>"):
+    translator = Translator(code, function_scope)
+    text = translator.translate()
+
+    namespace = dict(translator.constants)
+    namespace.update(FALLBACK=FALLBACK, tail_name=vm.tail_name, store=vm.store,
+                     store_fn=vm.store_fn, push_fn=vm.push_fn, finish=vm.finish)
+
+    exec(compile(text, label, "exec"), namespace)
+    code.native = namespace["compiled"]
+
+    return code.native
@@ -0,0 +1,143 @@
+import itertools
+import math
+import sys
+
+from pancake.helper.pancake_error import LimitError
+from pancake.helper.persistent_list import PersistentList
+from pancake.helper.persistent_map import PersistentMap, PersistentSet
+from pancake.helper.vector import is_vector
+import pancake.interpreter.vm as vm
+
+# Most and fewest instructions between checks of the stack length and
+# memory. Checks start off close together and spread out, unless memory use
+# is getting close to the limit. When memory is growing quickly (e.g. a
+# string doubling every call) they can be closer than MIN_CHECK_STEPS, see
+# Limits.check
+CHECK_STEPS = 1000
+MIN_CHECK_STEPS = 16
+# Items looked at to estimate the size of a list
+SAMPLE = 8
+# Lists nested deeper than this are only counted by their length
+SAMPLE_DEPTH = 3
+# Bytes for each item of a list (the reference to it)
+POINTER = 8
+
+# Rough size in bytes of a value. Lists are estimated from a few of their
+# items, so this takes the same time however much data there is
+def size_of(value, depth: int = 0) -> int:
+    if isinstance(value, PersistentList):
+        return sys.getsizeof(value) + estimate(value, depth + 1)
+    elif isinstance(value, PersistentMap):
+        return (sys.getsizeof(value) + estimate_items(value.keys(), len(value), depth + 1)
+                + estimate_items(value.values(), len(value), depth + 1))
+    elif isinstance(value, PersistentSet):
+        return sys.getsizeof(value) + estimate_items(iter(value), len(value), depth + 1)
+    elif is_vector(value):
+        return value.nbytes
+    else:
+        return sys.getsizeof(value)
+
+def estimate(items, depth: int = 0) -> int:
+    count = len(items)
+
+    if count == 0 or depth >= SAMPLE_DEPTH:
+        return count * POINTER
+
+    sample = [items[index] for index in range(0, count, max(1, count // SAMPLE))][:SAMPLE]
+    return count * (POINTER + sum(size_of(item, depth) for item in sample) // len(sample))
+
+# Same as estimate, for maps and sets (which can't be indexed), from the
+# first few items
+def estimate_items(items, count: int, depth: int) -> int:
+    if count == 0 or depth >= SAMPLE_DEPTH:
+        return count * POINTER
+
+    sample = list(itertools.islice(items, SAMPLE))
+    return count * (POINTER + sum(size_of(item, depth) for item in sample) // len(sample))
+
+# Rough size in bytes of everything a running program holds on to: the
+# stack, global variables and the arguments/locals of the calls that
+# haven't finished (estimated from the innermost few, the same way lists
+# are)
+def memory_of(interpreter) -> int:
+    used = estimate(interpreter.stack) + estimate(list(interpreter.variable_scope.values()))
+    frames = []
+    python_frame = sys._getframe()
+
+    # Only the innermost few Python frames are looked at, however deep the
+    # calls go
+    for _ in range(SAMPLE * 8):
+        if python_frame is None or len(frames) == SAMPLE:
+            break
+
+        if python_frame.f_code is vm.run.__code__:
+            frame = python_frame.f_locals["frame"]
+
+            # Slot 0 is the frame the function was made in, functions
+            # without arguments/locals (e.g. {: ... }) use the variables
+            # in there
+            while frame is not None and len(frame) == 1:
+                frame = frame[0]
+
+            if frame is not None:
+                frames.append(estimate(frame[1:]))
+
+        python_frame = python_frame.f_back
+
+    if len(frames) > 0:
+        used += interpreter.depth * sum(frames) // len(frames)
+
+    return used
+
+# What code run by an Interpreter is allowed to use, None for no limit:
+# - steps: instructions run by each eval/run
+# - depth: Pancake calls inside each other (tail calls don't count)
+# - stack: items on the stack
+# - memory: rough size in bytes of the program's data (see memory_of)
+# Going over one raises a LimitError. The stack and memory are only
+# checked every so often (at most CHECK_STEPS instructions apart), so they
+# can go a little over before it's noticed
+class Limits:
+    def __init__(self, steps=None, depth=None, stack=None, memory=None):
+        self.steps = math.inf if steps is None else steps
+        self.depth = math.inf if depth is None else depth
+        self.stack = math.inf if stack is None else stack
+        self.memory = math.inf if memory is None else memory
+
+    # Step count the VM should next call check at
+    def next_check(self, interpreter) -> int:
+        if self.stack == math.inf and self.memory == math.inf:
+            return interpreter.run_start + self.steps + 1
+        else:
+            return min(interpreter.steps + interpreter.check_steps, interpreter.run_start + self.steps + 1)
+
+    def check(self, interpreter):
+        if interpreter.steps - interpreter.run_start > self.steps:
+            raise LimitError(f"Ran more than {self.steps} instructions")
+        elif len(interpreter.stack) > self.stack:
+            raise LimitError(f"Stack has more than {self.stack} items")
+        elif self.memory != math.inf:
+            used = memory_of(interpreter)
+
+            if used > self.memory:
+                raise LimitError(f"Using more than {self.memory} bytes (about {used})")
+
+            if used > self.memory / 2 or 0 < 2 * interpreter.memory_used < used:
+                check_steps = MIN_CHECK_STEPS
+            else:
+                check_steps = min(2 * interpreter.check_steps, CHECK_STEPS)
+
+            # The next check is at most half way to where memory would go
+            # over the limit, if it kept growing by the same multiple each
+            # instruction as it has since the last one
+            if 0 < interpreter.memory_used < used:
+                growth = math.log(used / interpreter.memory_used) / max(1, interpreter.steps - interpreter.memory_checked)
+                check_steps = max(1, min(check_steps, int(math.log(self.memory / used) / growth / 2)))
+
+            interpreter.check_steps = check_steps
+            interpreter.memory_used = used
+            interpreter.memory_checked = interpreter.steps
+
+    def enter(self, interpreter):
+        if interpreter.depth > self.depth:
+            raise LimitError(f"Calls nested more than {self.depth} deep")
@@ -0,0 +1,173 @@
+import os
+from collections import ChainMap
+
+import pancake
+from pancake.helper.declare import Declare
+from pancake.helper.deref import Deref
+from pancake.helper.function import Function
+from pancake.helper.variable import Variable
+
+# Avoid circular import errors
+import pancake.interpreter.eval as evaluate
+import pancake.interpreter.interpreter as interpreter
+
+# Folder with stdlib/ in it, the last place files are looked for
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(pancake.__file__)))
+
+class Module:
+    def __init__(self, path, forms):
+        self.path = path
+        self.function_scope = {}
+        self.variable_scope = {}
+        self.loaded = False
+
+        # Modules that only define things (e.g. { n : n 2 + } =>add-2) are
+        # evaluated one definition at a time, as they're needed
+        self.definitions = Module.split_definitions(forms)
+        # Names defined by the module -> names of the module it uses
+        self.dependencies = {}
+
+    # Returns {name: [value, declaration]} if every top-level form is a
+    # literal followed by a declaration (with no name declared twice),
+    # otherwise None
+    @staticmethod
+    def split_definitions(forms):
+        forms = [form for form in forms if form is not None]
+        definitions = {}
+
+        if len(forms) % 2 != 0:
+            return None
+
+        for value, declare in zip(forms[::2], forms[1::2]):
+            if isinstance(value, (Variable, Deref, Declare)) \
+                or not isinstance(declare, Declare) \
+                or declare.name in definitions:
+                return None
+
+            definitions[declare.name] = [value, declare]
+
+        return definitions
+
+    # Names used by a value (anything inside a function body, including
+    # nested functions)
+    @staticmethod
+    def references(value) -> set:
+        names = set()
+
+        if isinstance(value, Function):
+            for form in value.body:
+                if isinstance(form, (Variable, Deref)):
+                    names.add(form.name)
+                elif isinstance(form, Function):
+                    names |= Module.references(form)
+
+        return names
+
+    # Builds the dependency graph, values is {name: value} for everything
+    # the module defines
+    def index(self, values: dict):
+        for name, value in values.items():
+            self.dependencies[name] = {other for other in Module.references(value) if other in values}
+
+    # Every name needed to use the given names, in O(size of the result)
+    def requirements(self, names) -> set:
+        needed = set()
+        remaining = list(names)
+
+        while len(remaining) > 0:
+            name = remaining.pop()
+
+            if name in needed:
+                continue
+            elif name not in self.dependencies:
+                raise NameError(f"Cannot require {name}, {self.path} doesn't define it")
+
+            needed.add(name)
+            remaining.extend(self.dependencies[name])
+
+        return needed
+
+    # Makes sure the given names (and what they use) have been evaluated,
+    # returning all of the names that are needed
+    def define(self, names, function_scope) -> set:
+        needed = self.requirements(names)
+
+        if self.definitions is not None:
+            scope = ChainMap(self.function_scope, function_scope)
+
+            for name in needed:
+                if name not in self.function_scope and name not in self.variable_scope:
+                    evaluate.evaluate(self.definitions[name], [], scope, self.variable_scope)
+
+        return needed
+
+    def define_all(self, function_scope) -> set:
+        return self.define(self.dependencies.keys(), function_scope)
+
+# Every file imported/required while running a program, so each one is
+# only evaluated once no matter how many times it's imported
+class ModuleRegistry:
+    def __init__(self, main_file=None):
+        self.main_file = None if main_file is None else os.path.abspath(main_file)
+        self.modules = {}
+        # Files currently being evaluated, innermost last
+        self.loading = []
+
+    # Relative paths are looked up next to the file doing the import, then
+    # in ROOT_DIR (never the current working directory)
+    def resolve(self, file_name: str) -> str:
+        if os.path.isabs(file_name):
+            directories = [""]
+        else:
+            directories = [ROOT_DIR]
+            importer = self.loading[-1] if self.loading else self.main_file
+
+            if importer is not None:
+                directories.insert(0, os.path.dirname(importer))
+
+        for directory in directories:
+            path = os.path.normpath(os.path.join(directory, file_name))
+
+            if os.path.isfile(path):
+                return path
+
+        raise FileNotFoundError(f"Cannot find {file_name} (looked in {', '.join(directories)})")
+
+    # Returns the module for a file. The first time it's loaded, the
+    # module is either split into definitions or (if it does anything
+    # else) evaluated in full. The module sees the importer's functions,
+    # but only keeps track of the ones it defines itself
+    def load(self, file_name: str, function_scope) -> Module:
+        path = self.resolve(file_name)
+
+        if path in self.modules:
+            module = self.modules[path]
+
+            if not module.loaded:
+                cycle = " -> ".join(self.loading[self.loading.index(path):] + [path])
+                raise ImportError(f"Import cycle: {cycle}")
+
+            return module
+
+        forms = interpreter.Interpreter.READ_FILE(path)
+        module = Module(path, forms)
+        self.modules[path] = module
+
+        if module.definitions is not None:
+            module.index({name: value for name, (value, _) in module.definitions.items()})
+            module.loaded = True
+            return module
+
+        self.loading.append(path)
+
+        try:
+            evaluate.evaluate(forms, [], ChainMap(module.function_scope, function_scope), module.variable_scope)
+        except:
+            del self.modules[path]
+            raise
+        finally:
+            self.loading.pop()
+
+        module.index(module.function_scope | module.variable_scope)
+        module.loaded = True
+        return module
@@ -0,0 +1,234 @@
+import operator
+
+from pancake.helper.code import Op
+from pancake.helper.declare import Declare, DeclareType
+from pancake.helper.variable import Variable
+
+# Avoid circular import errors
+import pancake.helper.function as function
+
+# Most instructions (not counting arguments) a function can have and still
+# be inlined
+INLINE_SIZE = 8
+
+# Builtins that can be run at compile time when both arguments are
+# constant numbers
+FOLDABLE = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.truediv,
+    "mod": operator.mod,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "eq": operator.eq
+}
+
+# Instructions that use the frame of the function they're in
+FRAME_OPS = {Op.LOAD_FAST, Op.LOAD_DEREF, Op.STORE_FAST, Op.MAKE_CLOSURE, Op.CALL_LOCAL, Op.TAIL_LOCAL}
+
+# Instructions that only push a value (and can be run twice or not at all
+# without changing anything)
+PURE_OPS = {Op.PUSH_CONST, Op.LOAD_FAST, Op.LOAD_DEREF}
+
+def is_number(value) -> bool:
+    return type(value) in (int, float)
+
+# Every variable used anywhere in forms, including inside function bodies
+def used_names(forms) -> set:
+    names = set()
+
+    for form in forms:
+        if isinstance(form, Variable):
+            names.add(form.name)
+        elif isinstance(form, function.Function):
+            names |= used_names(form.body)
+
+    return names
+
+# Works on the instructions of each piece of code as it's compiled (before
+# tail calls are marked):
+# - calls to small "stack words" like inc, swap or zero? are replaced with
+#   their bodies
+# - builtin arithmetic/comparisons on constants are done straight away
+# - locals that are stored but never used are popped instead
+class Optimizer:
+    def __init__(self):
+        # Functions declared once at the top level of a file, None for names
+        # that are declared more than once (or as variables), since there's
+        # no way of knowing which one will be called. Declarations inside
+        # functions are always local (e.g. 12#name), so they can't clash.
+        # Another file (or a later run) can still declare the same name,
+        # so code checks what it inlined is still there before it runs
+        self.definitions = {}
+        # Inlined instructions for each definition (None if it can't be)
+        self.bodies = {}
+        # Definitions whose bodies are being optimized, so recursive
+        # functions don't get inlined into themselves forever
+        self.expanding = set()
+
+    # Optimizer for an interpreter cloned from the one this belongs to
+    def copy(self) -> 'Optimizer':
+        optimizer = Optimizer()
+        optimizer.definitions = dict(self.definitions)
+        optimizer.bodies = dict(self.bodies)
+
+        return optimizer
+
+    # Finds the definitions in top-level forms ({ ... } =>name)
+    def declare(self, forms):
+        forms = [form for form in forms if form is not None]
+        top_level = set()
+
+        for value, declare in zip(forms, forms[1:]):
+            if isinstance(value, function.Function) and isinstance(declare, Declare) \
+                and declare.declare_type == DeclareType.FUNCTION:
+                top_level.add(id(declare))
+                self.define(declare.name, value)
+
+        for form in forms:
+            if isinstance(form, Declare) and id(form) not in top_level:
+                self.define(form.name, None)
+
+    def define(self, name: str, func):
+        if name in self.definitions:
+            func = None
+
+        self.definitions[name] = func
+        self.bodies.pop(name, None)
+
+    # Names that will be something else at runtime (e.g. native versions
+    # of stdlib functions), so they're never inlined
+    def replace(self, names):
+        for name in names:
+            self.define(name, None)
+
+    # Returns the optimized instructions and the functions that were
+    # inlined into them, as (name, function) pairs for Code.guards. Nothing
+    # is inlined into top-level code, which only runs once (and is where
+    # imports redefine things)
+    def optimize(self, instructions: list, func, inline=True) -> tuple:
+        guards = {}
+
+        if func is not None:
+            instructions = self.remove_dead_stores(instructions, func)
+
+            if inline:
+                instructions = self.inline(instructions, guards)
+
+        return self.fold_constants(instructions), tuple(guards.items())
+
+    # Instructions to run instead of calling name, or None if it isn't
+    # a small enough stack word
+    def body_of(self, name: str):
+        if name in self.bodies:
+            return self.bodies[name]
+
+        func = self.definitions.get(name)
+
+        if func is None or name in self.expanding:
+            return None
+
+        self.expanding.add(name)
+
+        try:
+            instructions = list(func.compiled().instructions)
+        finally:
+            self.expanding.discard(name)
+
+        self.bodies[name] = Optimizer.stack_word(func, instructions)
+        return self.bodies[name]
+
+    # A function can be inlined if it only uses its arguments at the start
+    # of its body, e.g. { a b : b a } or { n : n 1 + }: the arguments can
+    # stay on the stack (moved around by a SHUFFLE if they aren't used in
+    # the order they were given), and nothing else needs a frame
+    @staticmethod
+    def stack_word(func, instructions: list):
+        count = len(func.args)
+
+        if len(instructions) > 0:
+            op, arg = instructions[-1]
+
+            if op == Op.TAIL_NAME:
+                instructions[-1] = (Op.LOAD_NAME, arg)
+            elif op == Op.TAIL_BUILTIN:
+                instructions[-1] = (Op.CALL_BUILTIN, arg)
+
+        indexes = []
+
+        while len(instructions) > 0 and instructions[0][0] == Op.LOAD_FAST and instructions[0][1] <= count:
+            indexes.append(instructions.pop(0)[1] - 1)
+
+        if len(instructions) > INLINE_SIZE or any(op in FRAME_OPS for op, _ in instructions):
+            return None
+
+        if indexes == list(range(count)):
+            return instructions
+        else:
+            return [(Op.SHUFFLE, (count, tuple(indexes)))] + instructions
+
+    # Adds each function inlined (and the ones inlined into it) to guards
+    def inline(self, instructions: list, guards: dict) -> list:
+        result = []
+
+        for op, arg in instructions:
+            body = self.body_of(arg) if op == Op.LOAD_NAME else None
+
+            if body is None:
+                result.append((op, arg))
+            else:
+                result.extend(body)
+
+                definition = self.definitions[arg]
+                guards[arg] = definition
+                guards.update(definition.compiled().guards)
+
+        return result
+
+    # Does arithmetic on constants, and shuffles of values that were just
+    # pushed (e.g. 1 2 swap -> 2 1, x dup -> x x)
+    def fold_constants(self, instructions: list) -> list:
+        result = []
+
+        for op, arg in instructions:
+            if op == Op.SHUFFLE and len(result) >= arg[0] \
+                and all(pushed in PURE_OPS for pushed, _ in result[len(result) - arg[0]:]):
+                count, indexes = arg
+                values = result[len(result) - count:]
+                del result[len(result) - count:]
+
+                result.extend(values[index] for index in indexes)
+            elif op == Op.CALL_BUILTIN and arg in FOLDABLE and arg not in self.definitions \
+                and len(result) >= 2 and result[-1][0] == Op.PUSH_CONST and result[-2][0] == Op.PUSH_CONST \
+                and is_number(result[-2][1]) and is_number(result[-1][1]):
+                (_, a), (_, b) = result[-2:]
+
+                try:
+                    value = FOLDABLE[arg](a, b)
+                except ArithmeticError:
+                    # Left for the program to raise when it runs
+                    result.append((op, arg))
+                    continue
+
+                result[-2:] = [(Op.PUSH_CONST, value)]
+            else:
+                result.append((op, arg))
+
+        return result
+
+    # Locals that are never read (by the function or any function inside
+    # it) are popped off the stack instead of being stored
+    def remove_dead_stores(self, instructions: list, func) -> list:
+        used = {func.slots[name] for name in used_names(func.body) if name in func.slots}
+        result = []
+
+        for op, arg in instructions:
+            if op == Op.STORE_FAST and arg not in used:
+                result.append((Op.SHUFFLE, (1, ())))
+            else:
+                result.append((op, arg))
+
+        return result
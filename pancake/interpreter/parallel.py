@@ -0,0 +1,147 @@
+import atexit
+import io
+import itertools
+import os
+import pickle
+import threading
+import time
+from collections import ChainMap
+from concurrent.futures import ProcessPoolExecutor
+
+# Avoid circular import errors (interpreter has to be first, since this is
+# the first module a spawned worker imports)
+import pancake.interpreter.interpreter as interpreter
+import pancake.helper.builtins as builtins
+from pancake.interpreter.buffer import OutputBuffer
+
+# How long each chunk sent to a worker should take to run, long enough that
+# sending it back and forth doesn't matter
+CHUNK_SECONDS = 0.05
+# Lists that would take less than this to go through in one process aren't
+# worth sending anywhere
+PARALLEL_SECONDS = 0.2
+# Longest time spent timing the first few items before deciding
+PROBE_SECONDS = 0.01
+
+pool = None
+pool_size = os.cpu_count() or 1
+# Interpreters in different threads can share the pool
+pool_lock = threading.Lock()
+
+# Each worker loads the stdlib once into an interpreter of its own, then
+# every chunk it runs gets the functions/variables of the program that
+# sent it on top
+worker = None
+worker_payload = (None, None)
+
+def init_worker():
+    global worker
+
+    # Functions that are sent over have already been optimized
+    worker = interpreter.Interpreter(optimize=False)
+    worker.load_stdlib()
+
+def get_pool() -> ProcessPoolExecutor:
+    global pool
+
+    with pool_lock:
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=pool_size, initializer=init_worker)
+            atexit.register(shutdown_pool)
+
+    return pool
+
+# Stops the workers (a new pool is started if one is needed again)
+def shutdown_pool():
+    global pool
+
+    with pool_lock:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+            pool = None
+
+# Calls fn on each item on its own stack, returning the results
+def apply(fn, items, function_scope, variable_scope) -> list:
+    stack = []
+    results = []
+
+    for item in items:
+        stack.append(item)
+        fn.execute(stack, function_scope, variable_scope)
+        results.append(stack.pop())
+
+    return results
+
+# Runs in a worker, payload is the pickled function and the program's own
+# functions/variables (only unpickled again when it changes). Gives back
+# the results and what was printed, which the program that sent the chunk
+# writes to its own output
+def run_chunk(payload_id, payload: bytes, items: list) -> tuple:
+    global worker_payload
+
+    if worker_payload[0] != payload_id:
+        worker_payload = (payload_id, pickle.loads(payload))
+
+    fn, functions, variables = worker_payload[1]
+    output = io.StringIO()
+    worker.buffer = OutputBuffer(output)
+
+    with worker.running():
+        results = apply(fn, items, ChainMap(functions, worker.function_scope), variables)
+
+    worker.buffer.drain()
+    return results, output.getvalue()
+
+payload_ids = itertools.count(1)
+
+# Everything a worker needs to run fn that it doesn't already have (the
+# builtins in the tables are the same everywhere)
+def make_payload(fn, function_scope, variable_scope):
+    functions = {name: value for name, value in dict(function_scope).items()
+                 if builtins.ALL_BUILTINS.get(name) is not value}
+
+    return (os.getpid(), next(payload_ids)), pickle.dumps((fn, functions, dict(variable_scope)))
+
+# Calls fn on every item, spreading the items across a pool of processes in
+# chunks that take about CHUNK_SECONDS each. The first few items are run
+# here to see how long an item takes, and if the whole list would be quick
+# anyway it's all run here. Interpreters with limits run it all here too,
+# since workers don't count the instructions/memory they use
+def parallel_apply(fn, items, function_scope, variable_scope) -> list:
+    current = interpreter.Interpreter.current()
+
+    if current is not None and current.limits is not None:
+        return apply(fn, items, function_scope, variable_scope)
+
+    items = list(items)
+    results = []
+    start = time.perf_counter()
+
+    # At least one item is always timed
+    while len(results) < len(items) and (len(results) == 0 or time.perf_counter() - start < PROBE_SECONDS):
+        results.extend(apply(fn, items[len(results):len(results) + 1], function_scope, variable_scope))
+
+    if len(results) == len(items):
+        return results
+
+    per_item = (time.perf_counter() - start) / len(results)
+    remaining = items[len(results):]
+
+    if pool_size <= 1 or per_item * len(remaining) < PARALLEL_SECONDS:
+        return results + apply(fn, remaining, function_scope, variable_scope)
+
+    # Enough chunks that every worker gets a few (so one slow chunk doesn't
+    # hold everything up), but each one at least CHUNK_SECONDS of work
+    chunk_size = max(1, int(CHUNK_SECONDS / per_item), len(remaining) // (pool_size * 4))
+    payload_id, payload = make_payload(fn, function_scope, variable_scope)
+    futures = [get_pool().submit(run_chunk, payload_id, payload, remaining[index:index + chunk_size])
+               for index in range(0, len(remaining), chunk_size)]
+
+    # Output is written in the same order as the items, as if they'd all
+    # been run here
+    for future in futures:
+        chunk, printed = future.result()
+        results.extend(chunk)
+        builtins.output().write(printed)
+
+    return results
@@ -1,6 +1,30 @@
+from pancake.helper.persistent_list import PersistentList
+from pancake.helper.persistent_map import PersistentMap, PersistentSet
+from pancake.helper.seq import Seq
+from pancake.helper.vector import is_vector
+
+PLAIN = {str, int, float, bool}
+
+# Items of a list, with any Seqs in it gone through (they only show what's
+# been worked out already otherwise, see Seq.__repr__)
+def item(form) -> str:
+    return str(list(form)) if isinstance(form, Seq) else str(form)
+
 def pancake_print(form):
-    if isinstance(form, list):
-        items = ' '.join([str(x) for x in form])
+    # Most things printed are strings and numbers
+    if type(form) in PLAIN:
+        return str(form)
+    elif isinstance(form, (PersistentList, Seq)):
+        items = ' '.join([item(x) for x in form])
         return f"[ {items} ]"
+    elif isinstance(form, PersistentMap):
+        items = ' '.join([f"{pancake_print(key)} {pancake_print(value)}" for key, value in form.items()])
+        return f"map[ {items} ]"
+    elif isinstance(form, PersistentSet):
+        items = ' '.join([pancake_print(item) for item in form])
+        return f"set[ {items} ]"
+    elif is_vector(form):
+        items = ' '.join([str(x) for x in form.tolist()])
+        return f"vector[ {items} ]"
     else:
         return str(form)
@@ -0,0 +1,115 @@
+import time
+from collections import Counter
+
+from pancake.helper.function import Function
+
+class Stats:
+    def __init__(self):
+        self.calls = 0
+        # Nanoseconds, inclusive doesn't count recursive calls twice
+        self.inclusive = 0
+        self.exclusive = 0
+
+# Keeps the Pancake call stack while a program runs (the VM calls enter/exit
+# around every function body and builtin when vm.profiler is set), timing
+# each call with and without the calls it makes
+class Profiler:
+    def __init__(self):
+        self.stats = {}
+        # "<top level>;map;<lambda line 3>" -> exclusive nanoseconds
+        self.stacks = Counter()
+        # [label, start time, time spent in calls made from it]
+        self.frames = []
+        # How many times each label is on the stack right now
+        self.active = Counter()
+        # Function -> the name it was first defined with (builtins have
+        # their own)
+        self.names = {}
+
+    # Called when value is defined as a function called name, anything
+    # that isn't a function (e.g. 5 =>x) is left alone
+    def define(self, name: str, value):
+        function = getattr(value, "function", value)
+
+        if isinstance(function, Function) and function.name is None:
+            self.names.setdefault(function, name)
+
+    # Name shown for a function in reports: the name it was defined with,
+    # or where it was written for anonymous functions
+    def label(self, func) -> str:
+        if func is None:
+            return "<top level>"
+
+        function = getattr(func, "function", func)
+
+        if function.name is not None:
+            return function.name
+        elif function in self.names:
+            return self.names[function]
+        elif function.line is not None:
+            return f"<lambda line {function.line}>"
+        else:
+            return "<lambda>"
+
+    def enter(self, func):
+        name = self.label(func)
+        self.frames.append([name, time.perf_counter_ns(), 0])
+        self.active[name] += 1
+
+    def exit(self):
+        name, start, children = self.frames.pop()
+        elapsed = time.perf_counter_ns() - start
+
+        if name not in self.stats:
+            self.stats[name] = Stats()
+
+        stats = self.stats[name]
+        stats.calls += 1
+        stats.exclusive += elapsed - children
+        self.active[name] -= 1
+
+        if self.active[name] == 0:
+            stats.inclusive += elapsed
+
+        path = ";".join(frame[0] for frame in self.frames)
+        self.stacks[f"{path};{name}" if path else name] += elapsed - children
+
+        if self.frames:
+            self.frames[-1][2] += elapsed
+
+    # A tail call replaces the function that made it, like it would with
+    # a real stack
+    def tail(self, func):
+        self.exit()
+        self.enter(func)
+
+    def call_builtin(self, builtin, stack, function_scope, variable_scope):
+        self.enter(builtin)
+
+        try:
+            builtin.execute(stack, function_scope, variable_scope)
+        finally:
+            self.exit()
+
+    def call_builtin_tail(self, builtin, stack, function_scope, variable_scope):
+        self.enter(builtin)
+
+        try:
+            return builtin.execute_tail(stack, function_scope, variable_scope)
+        finally:
+            self.exit()
+
+    # Collapsed stacks (one "a;b;c microseconds" line per stack), the
+    # format flamegraph.pl, speedscope, inferno etc. read
+    def collapsed(self) -> str:
+        return "".join(f"{path} {nanoseconds // 1000}\n"
+                       for path, nanoseconds in self.stacks.items() if nanoseconds >= 1000)
+
+    def report(self, top: int = 20) -> str:
+        lines = [f"{'calls':>10} {'inclusive':>12} {'exclusive':>12}  function"]
+        ordered = sorted(self.stats.items(), key=lambda item: item[1].exclusive, reverse=True)
+
+        for name, stats in ordered[:top]:
+            lines.append(f"{stats.calls:>10} {stats.inclusive / 1e6:>10.1f}ms {stats.exclusive / 1e6:>10.1f}ms  {name}")
+
+        return "\n".join(lines)
@@ -3,81 +3,113 @@ import re
 from pancake.helper.declare import Declare, DeclareType
 from pancake.helper.deref import Deref
 from pancake.helper.function import Function
-from pancake.helper.reader import Reader
+from pancake.helper.persistent_list import PersistentList
+from pancake.helper.persistent_map import PersistentMap, PersistentSet
 from pancake.helper.symbol import Symbol
+from pancake.helper.token import Token, TokenType
 from pancake.helper.variable import Variable
 
-def tokenise(code):
-    regex = re.compile(r"""
-    [\s,]*                   # Whitespace
-    (
-        [\[\]{}()|]          # Special characters
-        | "(?:\\.|[^\\"])*"? # Strings
-        | \#.*               # Comments
-        | [^\s\[\]{}(),]*   # Every other literal
+# Characters that end a literal
+END = r"(?=[\s\[\]{}(),]|$)"
+
+TOKEN_REGEX = re.compile(rf"""
+    [\s,]*                                      # Whitespace
+    (?:
+        (?P<function_start>\{{)                 # Functions and lists
+        | (?P<function_end>\}})
+        | (?P<list_start>\[)
+        | (?P<map_start>map\[)                  # Maps and sets, closed by ]
+        | (?P<set_start>set\[)
+        | (?P<list_end>\])
+        | (?P<string>"(?:\\.|[^\\"])*")         # Strings
+        | (?P<open_string>"(?:\\.|[^\\"])*)     # Strings carrying on to the next line
+        | (?P<comment>\#.*)                     # Comments
+        | (?P<int>\d+){END}                     # Numbers
+        | (?P<float>[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?){END}
+        | (?P<word>[()|]|[^\s\[\]{{}}(),]+)     # Every other literal
     )
-    """, re.VERBOSE)
+    """, re.VERBOSE | re.DOTALL)
 
-    return re.findall(regex, code)
+# Rest of a string that was started on an earlier line
+STRING_REGEX = re.compile(r"""(?:\\.|[^\\"])*(")?""", re.DOTALL)
 
-def read_function(reader):
-    arguments = []
-    body = []
+FUNCTION_START = TokenType.FUNCTION_START
+FUNCTION_END = TokenType.FUNCTION_END
+LIST_START = TokenType.LIST_START
+LIST_END = TokenType.LIST_END
+MAP_START = TokenType.MAP_START
+SET_START = TokenType.SET_START
+STRING = TokenType.STRING
+COMMENT = TokenType.COMMENT
+WORD = TokenType.WORD
+INT = TokenType.INT
+FLOAT = TokenType.FLOAT
 
-    # Read all arguments (i.e. all tokens before : in a function)
-    while reader.peek() != ":":
-        arguments.append(reader.next())
+# Token type of each group in TOKEN_REGEX, by group number
+TOKEN_TYPES = [None] * (TOKEN_REGEX.groups + 1)
 
-    # Skip the :
-    reader.next()
+for name, index in TOKEN_REGEX.groupindex.items():
+    if name != "open_string":
+        TOKEN_TYPES[index] = TokenType[name.upper()]
 
-    while reader.peek() != "}":
-        body.append(read_form(reader))
+OPEN_STRING = TOKEN_REGEX.groupindex["open_string"]
 
-    # Skip the closing }
-    reader.next()
-    return Function(arguments, body)
+# Splits source code into tokens one line at a time, lines can be any
+# iterable of strings (e.g. an open file), so the whole source never has
+# to be in memory at once
+def tokenise(lines):
+    # Text, line and column of a string that hasn't been closed yet
+    string = None
 
-def read_list(reader):
-    elements = []
+    for line_number, line in enumerate(lines, start=1):
+        position = 0
 
-    while reader.peek() != "]":
-        elements.append(read_form(reader))
+        if string is not None:
+            match = STRING_REGEX.match(line)
+            text, start_line, start_column = string
+            position = match.end()
 
-    reader.next()
-    return elements
+            if match.group(1) is None:
+                string = (text + match.group(), start_line, start_column)
+                continue
 
-def is_float(string) -> bool:
-    try:
-        float(string)
-        return True
-    except ValueError:
-        return False
+            yield Token(STRING, text + match.group(), start_line, start_column)
+            string = None
+
+        for match in TOKEN_REGEX.finditer(line, position):
+            group = match.lastindex
 
-def read_form(reader):
-    current = reader.next()
+            # Always the last thing on the line
+            if group == OPEN_STRING:
+                string = (match.group(group), line_number, match.start(group) + 1)
+            else:
+                yield Token(TOKEN_TYPES[group], match.group(group), line_number, match.start(group) + 1)
 
-    # Basic data types (function, list, string, int, float)
-    if current == "{":
-        return read_function(reader)
-    elif current == "[":
-        return read_list(reader)
-    elif current == "true":
+    if string is not None:
+        _, start_line, start_column = string
+        raise SyntaxError(f"Unterminated string starting at line {start_line}, column {start_column}")
+
+def read_word(token: Token):
+    current = token.text
+
+    token_type = token.type
+
+    if token_type is WORD:
+        pass
+    elif token_type is STRING:
+        return current[1:-1]
+    elif token_type is INT:
+        return int(current)
+    elif token_type is FLOAT:
+        return float(current)
+
+    if current == "true":
         return True
     elif current == "false":
         return False
     # Symbols can't consist of just a :
     elif current[0] == ":" and len(current) >= 2:
         return Symbol(current[1:])
-    elif current[0] == "\"":
-        return current[1:-1]
-    elif current.isnumeric():
-        return int(current)
-    elif is_float(current):
-        return float(current)
-    # Comments
-    elif current[0] == "#":
-        return None
     # Function/variable declaration
     elif current[0:2] == "=>":
         return Declare(current[2:], DeclareType.FUNCTION)
@@ -89,3 +121,88 @@ def read_form(reader):
     # Regular variables
     else:
         return Variable(current)
+
+# What each token that starts a structure starts
+KINDS = {FUNCTION_START: "function", LIST_START: "list", MAP_START: "map", SET_START: "set"}
+
+# Makes a map literal out of the items between map[ and ], which are keys
+# followed by their values
+def read_map(structure) -> PersistentMap:
+    items = structure.items
+
+    if len(items) % 2 != 0:
+        raise SyntaxError(f"Key without a value in {structure.describe()}")
+
+    return PersistentMap.from_items(zip(items[0::2], items[1::2]))
+
+# A function, list, map or set that's still being read
+class Structure:
+    __slots__ = ("token", "items", "arguments")
+
+    def __init__(self, token: Token):
+        self.token = token
+        self.items = []
+        # Functions start off reading arguments, until the :
+        self.arguments = [] if token.type is FUNCTION_START else None
+
+    def describe(self) -> str:
+        kind = KINDS[self.token.type]
+        return f"{kind} starting at {self.token.position()}"
+
+# Turns tokens into forms, yielding each top-level form as soon as it has
+# been read. Nesting is tracked with an explicit stack, so unbalanced
+# brackets are reported where they happen (or at the end of the input)
+# instead of hanging
+def read_forms(tokens):
+    structures = []
+
+    for token in tokens:
+        token_type = token.type
+
+        if token_type is COMMENT:
+            continue
+        elif len(structures) > 0 and structures[-1].arguments is not None:
+            current = structures[-1]
+
+            # Read all arguments (i.e. all tokens before : in a function)
+            if token_type is FUNCTION_END:
+                raise SyntaxError(f"Missing : in {current.describe()}")
+            elif token_type is not WORD:
+                raise SyntaxError(f"Unexpected {token.text} in arguments of {current.describe()}")
+            elif token.text == ":":
+                current.items.append(current.arguments)
+                current.arguments = None
+            else:
+                current.arguments.append(token.text)
+
+            continue
+        elif token_type in KINDS:
+            structures.append(Structure(token))
+            continue
+        elif token_type is FUNCTION_END or token_type is LIST_END:
+            if len(structures) == 0:
+                raise SyntaxError(f"Unexpected {token.text} at {token.position()}")
+
+            current = structures.pop()
+            start_type = current.token.type
+
+            if token_type is FUNCTION_END and start_type is FUNCTION_START:
+                form = Function(current.items[0], current.items[1:], line=current.token.line)
+            elif token_type is LIST_END and start_type is LIST_START:
+                form = PersistentList.from_iterable(current.items)
+            elif token_type is LIST_END and start_type is MAP_START:
+                form = read_map(current)
+            elif token_type is LIST_END and start_type is SET_START:
+                form = PersistentSet.from_iterable(current.items)
+            else:
+                raise SyntaxError(f"Unexpected {token.text} at {token.position()}, {current.describe()} isn't closed")
+        else:
+            form = read_word(token)
+
+        if len(structures) > 0:
+            structures[-1].items.append(form)
+        else:
+            yield form
+
+    if len(structures) > 0:
+        raise SyntaxError(f"Unterminated {structures[-1].describe()}")
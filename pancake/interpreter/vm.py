@@ -0,0 +1,249 @@
+from contextvars import ContextVar
+
+from pancake.helper.code import Op
+
+# Avoid circular import errors
+import pancake.interpreter.jit as jit
+
+PUSH_CONST = Op.PUSH_CONST
+LOAD_FAST = Op.LOAD_FAST
+LOAD_DEREF = Op.LOAD_DEREF
+LOAD_NAME = Op.LOAD_NAME
+CALL_BUILTIN = Op.CALL_BUILTIN
+STORE_FAST = Op.STORE_FAST
+STORE = Op.STORE
+STORE_FN = Op.STORE_FN
+PUSH_FN = Op.PUSH_FN
+MAKE_CLOSURE = Op.MAKE_CLOSURE
+TAIL_NAME = Op.TAIL_NAME
+TAIL_BUILTIN = Op.TAIL_BUILTIN
+SHUFFLE = Op.SHUFFLE
+CALL_LOCAL = Op.CALL_LOCAL
+TAIL_LOCAL = Op.TAIL_LOCAL
+
+# Interpreter whose code is running in this thread (or asyncio task), set
+# by Interpreter.running. Its profiler (if it has one) records every call
+current = ContextVar("current", default=None)
+
+def load_name(name, stack, function_scope, variable_scope, profiler=None):
+    if name in variable_scope:
+        stack.append(variable_scope[name])
+    elif name in function_scope:
+        func = function_scope[name]
+
+        if profiler is not None and func.is_builtin:
+            profiler.call_builtin(func, stack, function_scope, variable_scope)
+        else:
+            func.execute(stack, function_scope, variable_scope)
+    else:
+        raise NameError(f"Undefined symbol {name}")
+
+# Frame depth frames up from frame (for LOAD_DEREF and CALL_LOCAL)
+def enclosing(frame: list, depth: int) -> list:
+    for _ in range(depth):
+        frame = frame[0]
+
+    return frame
+
+# Calls a function that's a local of some frame
+def call_local(func, stack, function_scope, variable_scope, profiler=None):
+    if profiler is not None and func.is_builtin:
+        profiler.call_builtin(func, stack, function_scope, variable_scope)
+    else:
+        func.execute(stack, function_scope, variable_scope)
+
+# Function a TAIL_NAME calls (once it's known name isn't a variable)
+def tail_name(name, function_scope):
+    if name in function_scope:
+        return function_scope[name]
+    else:
+        raise NameError(f"Undefined symbol {name}")
+
+# The rest of a call compiled code made straight to the compiled code of
+# func (see jit.py), result is what that gave back: FALLBACK or a function
+# to tail call
+def finish(result, code, frame, func, stack, function_scope, variable_scope):
+    if result is jit.FALLBACK:
+        run(code, stack, function_scope, variable_scope, frame, func)
+        return
+
+    while result is not None and result.is_builtin:
+        result = result.execute_tail(stack, function_scope, variable_scope)
+
+    if result is not None:
+        result.execute(stack, function_scope, variable_scope)
+
+def store(name, stack, function_scope, variable_scope):
+    if name in function_scope:
+        raise NameError(f"Cannot name {name} as variable when it is already a function")
+
+    variable_scope[name] = stack.pop()
+
+def store_fn(name, stack, function_scope, variable_scope):
+    if name in variable_scope:
+        raise NameError(f"Cannot name {name} as function when it is already a variable")
+
+    value = stack.pop()
+    interpreter = current.get()
+
+    # Lets the profiler show the function by name
+    if interpreter is not None and interpreter.profiler is not None:
+        interpreter.profiler.define(name, value)
+
+    function_scope[name] = value
+
+def push_fn(name, stack, function_scope):
+    if name in function_scope:
+        stack.append(function_scope[name])
+    else:
+        raise NameError(f"Cannot dereference {name}, not a function")
+
+# Runs compiled code. Arguments/locals live in frame (None for top-level
+# code), variable_scope only holds global variables. func is the function
+# the code belongs to, it's only used by the profiler
+def run(code, stack, function_scope, variable_scope, frame=None, func=None):
+    # Checked once per call, builtin calls only look at the local flag
+    interpreter = current.get()
+
+    if interpreter is None:
+        profiler = None
+        limits = None
+        jitting = False
+    else:
+        profiler = interpreter.profiler
+        limits = interpreter.limits
+        # Compiled code doesn't tell the profiler about the calls it makes
+        jitting = interpreter.jit and profiler is None
+
+    profiling = profiler is not None
+
+    if profiling:
+        profiler.enter(func)
+
+    try:
+        if limits is not None:
+            interpreter.depth += 1
+            limits.enter(interpreter)
+
+        push = stack.append
+
+        # Tail calls swap out the code/frame being run and go around again,
+        # so loops written with recursion don't use up the Python stack
+        while True:
+            func = None
+
+            # Code with functions inlined into it checks they haven't been
+            # redefined (by an import, or a later run) since
+            if code.guards:
+                code = code.checked(function_scope)
+
+            # Bodies have no jumps, so every instruction in one gets run
+            if interpreter is not None:
+                steps = interpreter.steps + len(code.instructions)
+                interpreter.steps = steps
+
+                if steps >= interpreter.check_at:
+                    interpreter.checkpoint()
+
+            instructions = code.instructions
+
+            # Code that has been run enough times is turned into Python
+            # (see jit.py), which is run instead of the instructions
+            if jitting:
+                native = code.native
+
+                if native is None:
+                    code.calls += 1
+
+                    if code.calls == jit.JIT_CALLS:
+                        native = jit.compile_code(code, function_scope)
+
+                if native is not None:
+                    func = native(stack, frame, function_scope, variable_scope, interpreter)
+
+                    if func is jit.FALLBACK:
+                        func = None
+                    else:
+                        instructions = ()
+
+            for op, arg in instructions:
+                if op is LOAD_FAST:
+                    push(frame[arg])
+                elif op is PUSH_CONST:
+                    push(arg)
+                elif op is CALL_BUILTIN:
+                    # Variables can't share a name with a function, so there's no
+                    # need to check variable_scope first
+                    if profiling:
+                        profiler.call_builtin(function_scope[arg], stack, function_scope, variable_scope)
+                    else:
+                        function_scope[arg].execute(stack, function_scope, variable_scope)
+                elif op is LOAD_NAME:
+                    load_name(arg, stack, function_scope, variable_scope, profiler)
+                elif op is LOAD_DEREF:
+                    depth, slot = arg
+                    env = frame
+
+                    for _ in range(depth):
+                        env = env[0]
+
+                    push(env[slot])
+                elif op is STORE_FAST:
+                    frame[arg] = stack.pop()
+                elif op is SHUFFLE:
+                    count, indexes = arg
+
+                    if len(stack) < count:
+                        raise IndexError("pop from empty list")
+
+                    values = stack[len(stack) - count:]
+                    del stack[len(stack) - count:]
+
+                    for index in indexes:
+                        push(values[index])
+                elif op is MAKE_CLOSURE:
+                    # Closures see the values locals had when they were made
+                    push(arg.closure(frame[:]))
+                elif op is TAIL_BUILTIN:
+                    func = function_scope[arg]
+                elif op is TAIL_NAME:
+                    if arg in variable_scope:
+                        push(variable_scope[arg])
+                    elif arg in function_scope:
+                        func = function_scope[arg]
+                    else:
+                        raise NameError(f"Undefined symbol {arg}")
+                elif op is STORE:
+                    store(arg, stack, function_scope, variable_scope)
+                elif op is STORE_FN:
+                    store_fn(arg, stack, function_scope, variable_scope)
+                elif op is PUSH_FN:
+                    push_fn(arg, stack, function_scope)
+                elif op is CALL_LOCAL:
+                    depth, slot = arg
+                    call_local(enclosing(frame, depth)[slot], stack, function_scope, variable_scope, profiler)
+                elif op is TAIL_LOCAL:
+                    depth, slot = arg
+                    func = enclosing(frame, depth)[slot]
+
+            # Builtins like exec and if hand back the function they would call
+            while func is not None and func.is_builtin:
+                if profiling:
+                    func = profiler.call_builtin_tail(func, stack, function_scope, variable_scope)
+                else:
+                    func = func.execute_tail(stack, function_scope, variable_scope)
+
+            if func is None:
+                return
+
+            if profiling:
+                profiler.tail(func)
+
+            code = func.compiled()
+            frame = func.new_frame(stack)
+    finally:
+        if limits is not None:
+            interpreter.depth -= 1
+
+        if profiling:
+            profiler.exit()
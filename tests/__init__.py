@@ -0,0 +1,49 @@
+import io
+import os
+import tempfile
+import unittest
+
+from pancake.interpreter.interpreter import Interpreter
+from pancake.interpreter.print import pancake_print
+
+# What running source prints, in a clone of the image with the stdlib
+# loaded. files are written to a directory first and source is run as
+# main.pan in it (so it can import them), options go to clone (jit,
+# limits, file_name...). With errors, an error doesn't get raised, it's
+# added to the output along with what was left on the stack
+def run(source: str, native_stdlib=True, optimize=True, files=None, errors=False, **options) -> str:
+    output = io.StringIO()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, text in (files or {}).items():
+            with open(os.path.join(directory, name), "w") as f:
+                f.write(text)
+
+        if files is not None:
+            options["file_name"] = os.path.join(directory, "main.pan")
+
+        interpreter = Interpreter.image(native_stdlib, optimize).clone(output=output, **options)
+
+        try:
+            interpreter.run(source)
+        except Exception as e:
+            if not errors:
+                raise
+
+            output.write(f"{type(e).__name__}: {e}\n")
+            output.write(" ".join(pancake_print(value) for value in interpreter.stack) + "\n")
+
+    return output.getvalue()
+
+# Variants for assert_output
+STDLIBS = ({"native_stdlib": True}, {"native_stdlib": False})
+JIT = ({"jit": True}, {"jit": False})
+OPTIMIZE = ({"optimize": False}, {"optimize": True})
+
+class TestCase(unittest.TestCase):
+    # source prints expected when it's run with each of variants (dicts of
+    # arguments to run, on top of options)
+    def assert_output(self, source: str, expected: str, variants=({},), **options):
+        for variant in variants:
+            with self.subTest(**variant):
+                self.assertEqual(run(source, **options, **variant), expected)
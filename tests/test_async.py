@@ -0,0 +1,85 @@
+import asyncio
+import unittest
+from unittest import mock
+
+import pancake.interpreter.asynchronous as asynchronous
+from pancake.interpreter.asynchronous import AsyncInterpreter
+from pancake.interpreter.interpreter import Interpreter
+
+# Counts to n a step at a time, so it needs a lot of turns to finish
+def script(n: int) -> str:
+    return f"0 {{: 1 + }} {{: dup {n} < }} while print"
+
+# Same, but it reads a line first (so it can be seen to have started)
+def started_script(n: int) -> str:
+    return '"" input pop ' + script(n)
+
+# Runs each source in its own AsyncInterpreter on one loop, all at once.
+# Gives the output of each one and the order they started (read input) and
+# finished in, as ("start"/"done", index)
+async def run_all(sources: list, steps: int) -> tuple:
+    image = Interpreter.image()
+    outputs = [[] for _ in sources]
+    events = []
+
+    async def run_one(index: int):
+        async def output(text):
+            outputs[index].append(text)
+
+        async def read(prompt):
+            events.append(("start", index))
+            return ""
+
+        await AsyncInterpreter(output=output, input=read, image=image, steps=steps).run(sources[index])
+        events.append(("done", index))
+
+    await asyncio.gather(*(run_one(index) for index in range(len(sources))))
+    return ["".join(lines) for lines in outputs], events
+
+def finished(events: list) -> list:
+    return [index for event, index in events if event == "done"]
+
+# Lots of scripts sharing a loop take turns, so they all get the right
+# output and none of them has to wait for the others to finish
+class TestAsync(unittest.TestCase):
+    def test_output(self):
+        sources = [script(n) for n in range(1000)]
+        outputs, events = asyncio.run(run_all(sources, 500))
+
+        self.assertEqual(outputs, [f"{n}\n" for n in range(1000)])
+        self.assertEqual(sorted(finished(events)), list(range(1000)))
+
+    # A short script started after long ones doesn't wait for any of them
+    def test_fair(self):
+        sources = [script(2000) for _ in range(50)] + [script(1)]
+        outputs, events = asyncio.run(run_all(sources, 200))
+
+        self.assertEqual(outputs, ["2000\n"] * 50 + ["1\n"])
+        self.assertEqual(finished(events)[0], 50)
+
+    # Scripts with the same amount of work all get going before any of them
+    # finishes, instead of running one after another
+    def test_interleaved(self):
+        sources = [started_script(2000) for _ in range(50)]
+        outputs, events = asyncio.run(run_all(sources, 200))
+
+        self.assertEqual(outputs, ["2000\n"] * 50)
+        self.assertEqual([event for event, _ in events], ["start"] * 50 + ["done"] * 50)
+
+    # Past MAX_THREADS, scripts wait for one to finish before they start
+    def test_max_threads(self):
+        sources = [started_script(500) for _ in range(20)]
+
+        with mock.patch.object(asynchronous, "MAX_THREADS", 4):
+            outputs, events = asyncio.run(run_all(sources, 100))
+
+        running = 0
+
+        for event, _ in events:
+            running += 1 if event == "start" else -1
+            self.assertLessEqual(running, 4)
+
+        self.assertEqual(outputs, ["500\n"] * 20)
+
+if __name__ == "__main__":
+    unittest.main()
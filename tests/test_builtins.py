@@ -0,0 +1,51 @@
+import unittest
+
+from pancake.helper.vector import numpy
+from tests import STDLIBS, TestCase, run
+
+# Builtins that aren't native versions of stdlib functions have to be there
+# with --pure-stdlib as well
+class TestPureStdlib(TestCase):
+    def test_parallel(self):
+        self.assert_output("0 5 range { x : x x * } pmap print 0 5 range { x : x 2 mod 0 eq } pfilter print",
+                           "[ 0 1 4 9 16 ]\n[ 0 2 4 ]\n", STDLIBS)
+
+    def test_memo(self):
+        self.assert_output("{ n : {: n 1 - fib n 2 - fib + } {: n } n 2 < if } =>fib &fib memo =>fib 30 fib print "
+                           "{ n : n n * } =>sq &sq 10 memo-limit =>sq 3 sq 3 sq + print &sq memo-stats print",
+                           "832040\n18\n[ 1 1 0 1 10 ]\n", STDLIBS)
+
+# Keys are told apart by their type as well as their value
+class TestMaps(TestCase):
+    def test_keys(self):
+        self.assert_output("map[ 1 :one 1.0 :onef true :t [ 1 ] :l [ 1.0 ] :lf ] =m "
+                           "m length print 1.0 m get print [ 1 ] m get print 1 set[ 1.0 ] append length print",
+                           "5\n:onef\n:l\n2\n")
+
+    @unittest.skipIf(numpy is None, "needs NumPy")
+    def test_vector_key(self):
+        with self.assertRaisesRegex(TypeError, "Vectors can't be used as keys"):
+            run(":x [ 1 2 ] vector map[ ] assoc")
+
+    # Maps and sets aren't lists, whichever stdlib is used
+    def test_not_lists(self):
+        for source in ("map[ 1 2 ] { x : x } map", "map[ 1 2 ] first", "set[ 1 2 ] { x : x print } for"):
+            for variant in STDLIBS:
+                with self.subTest(source=source, **variant), self.assertRaisesRegex(TypeError, "only works on lists"):
+                    run(source, **variant)
+
+# + on a list and a vector is refused whichever way round they are, other
+# arithmetic works on the items of the list
+@unittest.skipIf(numpy is None, "needs NumPy")
+class TestVectors(TestCase):
+    def test_mixed_add(self):
+        for source in ("[ 1 2 ] [ 3 4 ] vector +", "[ 3 4 ] vector [ 1 2 ] +", "[ 3 4 ] vector 0 2 range +"):
+            with self.subTest(source=source), self.assertRaisesRegex(TypeError, "Can't add a list and a vector"):
+                run(source)
+
+    def test_mixed_arithmetic(self):
+        self.assert_output("[ 1 2 ] vector [ 3 4 ] * print [ 1 2 ] [ 3 4 ] vector - print [ 1 2 ] [ 3 ] + print",
+                           "vector[ 3 8 ]\nvector[ -2 -2 ]\n[ 1 2 3 ]\n")
+
+if __name__ == "__main__":
+    unittest.main()
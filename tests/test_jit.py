@@ -0,0 +1,43 @@
+import unittest
+
+from pancake.interpreter.jit import JIT_CALLS
+from tests import JIT, TestCase
+
+# Enough calls for code to get compiled
+CALLS = JIT_CALLS * 2
+
+# Compiled code does the same as the VM, ifs written out and calls made
+# straight to other compiled functions included
+class TestJit(TestCase):
+    def test_recursion(self):
+        self.assert_output("{ n : {: n 1 - fact n * } {: 1 } n 0 eq if } =>fact "
+                           f"0 {CALLS} range {{ x : x 10 mod fact pop }} for 20 fact print",
+                           "2432902008176640000\n", JIT)
+
+    def test_nested_if(self):
+        self.assert_output("{ n : {: {: 1 } {: 2 } n 5 < if 10 * } {: 0 } n 0 eq if 3 + } =>k "
+                           f"0 {CALLS} range {{ x : x 10 mod k }} map 12 take print",
+                           "[ 3 23 23 23 23 13 13 13 13 13 3 23 ]\n", JIT)
+
+    def test_redefined_callee(self):
+        self.assert_output("{ n : {: n 1 - g n * } {: 1 } n 0 eq if } =>g "
+                           f"0 {CALLS} range {{ x : x 10 mod g pop }} for {{ n : 7 }} =>g 5 g print",
+                           "7\n", JIT)
+
+    def test_redefined_if(self):
+        self.assert_output("{ n : {: n 1 - h n + } {: 0 } n 0 eq if } =>h "
+                           f"0 {CALLS} range {{ x : x 10 mod h pop }} for {{ a b c : c }} =>if 5 h print",
+                           "False\n", JIT)
+
+    # The stack is left the way the VM would have left it
+    def test_errors(self):
+        self.assert_output("{ n : {: n 1 - } {: 0 } n 0 eq if } =>f "
+                           f"0 {CALLS} range {{ x : x f pop }} for 9 \"a\" f",
+                           "TypeError: unsupported operand type(s) for -: 'str' and 'int'\n9\n", JIT, errors=True)
+        self.assert_output("{ n : {: 1 } {: 2 } n 0 < if } =>f "
+                           f"0 {CALLS} range {{ x : x f pop }} for 9 \"a\" f",
+                           "TypeError: '<' not supported between instances of 'str' and 'int'\n9 {: 1 } {: 2 }\n",
+                           JIT, errors=True)
+
+if __name__ == "__main__":
+    unittest.main()
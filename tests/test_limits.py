@@ -0,0 +1,30 @@
+import re
+import unittest
+from unittest import mock
+
+from pancake.helper.pancake_error import LimitError
+from pancake.interpreter.limits import Limits
+import pancake.interpreter.parallel as parallel
+from tests import run
+
+# Limits hold however the code is run
+class TestLimits(unittest.TestCase):
+    # Workers don't count steps, so none of the work goes to them
+    def test_parallel(self):
+        source = "{ n : {: n 1 - spin } {: 0 } n 0 eq if } =>spin [ 1 2 3 4 ] { x : 10000 spin } pmap print"
+
+        with mock.patch.object(parallel, "pool_size", 4), mock.patch.object(parallel, "PARALLEL_SECONDS", 0):
+            with self.assertRaises(LimitError):
+                run(source, limits=Limits(steps=70000))
+
+    # Memory that keeps doubling is caught within a doubling of the limit
+    def test_memory_growth(self):
+        for limit in (10_000_000, 100_000_000):
+            with self.subTest(limit=limit), self.assertRaises(LimitError) as error:
+                run('"abcdefgh" {: dup + } {: true } while', limits=Limits(memory=limit))
+
+            used = int(re.search(r"about (\d+)", str(error.exception)).group(1))
+            self.assertLess(used, 2 * limit)
+
+if __name__ == "__main__":
+    unittest.main()
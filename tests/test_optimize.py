@@ -0,0 +1,29 @@
+import io
+import unittest
+
+from pancake.interpreter.interpreter import Interpreter
+from tests import OPTIMIZE, TestCase
+
+# Inlining a function has to give the same output as calling it, even when
+# the name is declared again somewhere the optimizer can't see
+class TestRedefinition(TestCase):
+    def test_redefined_by_import(self):
+        self.assert_output("{ n : n 1 + } =>f\n\"lib.pan\" import\n{ : 5 f } =>g\ng print\n5 f print\n",
+                           "7\n7\n", OPTIMIZE, files={"lib.pan": "{ n : n 2 + } =>f\n"})
+
+    def test_redefined_after_stdlib(self):
+        self.assert_output("{ n : n 2 + } =>inc\n0 5 range print\n", "[ 0 2 4 ]\n", OPTIMIZE,
+                           native_stdlib=False)
+
+    def test_redefined_in_later_run(self):
+        interpreter = Interpreter.image().clone(output=io.StringIO())
+        interpreter.run("{ n : n 1 + } =>f { n : n f } =>g")
+
+        for _ in range(3):
+            interpreter.run("5 g print")
+
+        interpreter.run("{ n : n 10 + } =>f 5 g print")
+        self.assertEqual(interpreter.output.getvalue(), "6\n6\n6\n15\n")
+
+if __name__ == "__main__":
+    unittest.main()
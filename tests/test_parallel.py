@@ -0,0 +1,41 @@
+import unittest
+from unittest import mock
+
+import pancake.interpreter.parallel as parallel
+from tests import TestCase
+
+# Sizes that send every item after the first to the pool, a few at a time
+POOL = {"pool_size": 2, "PROBE_SECONDS": 0, "PARALLEL_SECONDS": 0, "CHUNK_SECONDS": 0}
+
+# The items really go through the pool, and the program gets the same
+# results and output as it would running them itself
+class TestPool(TestCase):
+    def setUp(self):
+        for name, value in POOL.items():
+            patch = mock.patch.object(parallel, name, value)
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        self.addCleanup(parallel.shutdown_pool)
+
+    # Only the item used to time fn is run here
+    def test_pool_used(self):
+        with mock.patch.object(parallel, "apply", wraps=parallel.apply) as apply:
+            self.assert_output("0 20 range { x : x 1 + } pmap print", f"[ {' '.join(str(x) for x in range(1, 21))} ]\n")
+
+        self.assertEqual(sum(len(call.args[1]) for call in apply.call_args_list), 1)
+        self.assertIsNotNone(parallel.pool)
+
+    # Functions and variables the program defined are sent along with fn
+    def test_definitions(self):
+        self.assert_output("{ x : x x * } =>sq 3 =k 0 40 range { x : x sq k + } pmap print "
+                           "0 40 range { x : x k mod 0 eq } pfilter print",
+                           f"[ {' '.join(str(x * x + 3) for x in range(40))} ]\n"
+                           f"[ {' '.join(str(x) for x in range(0, 40, 3))} ]\n")
+
+    def test_output(self):
+        self.assert_output("0 30 range { x : x print x } pmap length print",
+                           "".join(f"{x}\n" for x in range(30)) + "30\n")
+
+if __name__ == "__main__":
+    unittest.main()
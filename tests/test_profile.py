@@ -0,0 +1,23 @@
+import io
+import unittest
+
+from pancake.interpreter.interpreter import Interpreter
+from pancake.interpreter.profile import Profiler
+
+# The profiler shows functions by the names they were defined with
+class TestProfile(unittest.TestCase):
+    def test_names(self):
+        profiler = Profiler()
+        interpreter = Interpreter.image(native_stdlib=False).clone(profiler=profiler, output=io.StringIO())
+
+        interpreter.run("{ n : n 1 + } =>inc 5 =>five 0 3 range &inc map realize &five pop pop")
+
+        self.assertIn("inc", profiler.stats)
+        self.assertIn("map", profiler.stats)
+        # Nothing is written to the functions themselves (they're shared
+        # with the image and other clones)
+        self.assertIsNone(interpreter.function_scope["inc"].name)
+        self.assertIsNone(Interpreter.image(native_stdlib=False).function_scope["map"].name)
+
+if __name__ == "__main__":
+    unittest.main()
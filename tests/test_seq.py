@@ -0,0 +1,48 @@
+import io
+import unittest
+
+from pancake.interpreter.interpreter import Interpreter
+from tests import STDLIBS, TestCase, run
+
+# Items of a lazy sequence are worked out once and kept
+class TestCaching(TestCase):
+    def test_side_effects_once(self):
+        source = ("0 5 range { x : x print x 10 * } map =ys "
+                  "2 ys nth 4 ys nth 0 ys nth ys length 0 1 - ys nth ys ys realize "
+                  "print print print print print print print")
+        expected = "0\n1\n2\n3\n4\n[ 0 10 20 30 40 ]\n[ 0 10 20 30 40 ]\n40\n5\n0\n40\n20\n"
+
+        self.assert_output(source, expected, STDLIBS)
+
+    def test_stages_on_kept_items(self):
+        source = ("0 20 range { x : x print x x * } map =zs "
+                  "zs { x : x 2 mod 0 eq } filter length zs 3 take realize zs length "
+                  "print print print")
+
+        self.assertEqual(run(source), "".join(f"{x}\n" for x in range(20)) + "20\n[ 0 1 4 ]\n10\n")
+
+    # Every nth used to go through the whole pipeline again from the start,
+    # the map function only runs once for each item
+    def test_random_access(self):
+        source = ("0 2000 range { x : x print x x * } map =xs "
+                  "0 2000 range { i : i xs nth pop } for 1999 xs nth print xs length print")
+
+        self.assertEqual(run(source), "".join(f"{x}\n" for x in range(2000)) + "3996001\n2000\n")
+
+    # Getting a Seq as a string doesn't run anything
+    def test_repr(self):
+        output = io.StringIO()
+        interpreter = Interpreter.image().clone(output=output)
+
+        interpreter.run("0 5 range { x : x print x 10 * } map =ys 1 ys nth pop")
+        self.assertEqual(repr(interpreter.variable_scope["ys"]), "[0, 10, ...]")
+        self.assertEqual(output.getvalue(), "0\n1\n")
+
+    def test_take(self):
+        self.assertEqual(run("0 10 range { x : x 3 mod 0 eq } filter 2 take print "
+                             "0 10 range { x : x print x } map 0 take print "
+                             "0 10 range { x : x 5 < } take-while { x : x 1 + } map print"),
+                         "[ 0 3 ]\n[  ]\n[ 1 2 3 4 5 ]\n")
+
+if __name__ == "__main__":
+    unittest.main()
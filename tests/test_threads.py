@@ -0,0 +1,76 @@
+import glob
+import io
+import os
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from pancake.interpreter.interpreter import Interpreter
+from tests import run
+
+EXAMPLES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), "..", "example", "*.pan")))
+
+# Every script defines the same names, with values that depend on n
+def script(n: int) -> str:
+    return (f"{{ x : x {n} + }} =>f {n} =base "
+            "{ k : {: k 1 - down base + } {: 0 } k 0 eq if } =>down "
+            "0 5 range { x : x f } map print 10 down print")
+
+def expected(n: int) -> str:
+    return f"[ {' '.join(str(x + n) for x in range(5))} ]\n{10 * n}\n"
+
+# The examples, run in a clone of the image each
+def run_example(file_name: str) -> str:
+    with open(file_name) as f:
+        return run(f.read(), file_name=file_name, input=io.StringIO())
+
+# Run in a clone of the shared image, then run again in the same
+# interpreter using what the first run defined
+def run_script(n: int) -> str:
+    output = io.StringIO()
+    interpreter = Interpreter.image().clone(output=output)
+
+    interpreter.run(script(n))
+    interpreter.run("base f print")
+
+    return output.getvalue()
+
+# Interpreters running in different threads at once can't see each other's
+# definitions, and get the same output as they would on their own
+class TestThreads(unittest.TestCase):
+    def test_isolated(self):
+        with ThreadPoolExecutor(16) as pool:
+            results = list(pool.map(run_script, range(400)))
+
+        for n, output in enumerate(results):
+            self.assertEqual(output, expected(n) + f"{2 * n}\n")
+
+        # Nothing was defined in the image they were cloned from
+        with self.assertRaises(NameError):
+            Interpreter.image().clone(output=io.StringIO()).run("0 f")
+
+    def test_deterministic(self):
+        alone = {file_name: run_example(file_name) for file_name in EXAMPLES}
+
+        with ThreadPoolExecutor(16) as pool:
+            results = list(pool.map(run_example, EXAMPLES * 20))
+
+        for file_name, output in zip(EXAMPLES * 20, results):
+            self.assertEqual(output, alone[file_name], file_name)
+
+    # Functions from different reads never share an ID (their locals are
+    # named after it), even when they're read at the same time
+    def test_function_ids(self):
+        source = "{ x : { y : x y + } } { z : z }"
+
+        with ThreadPoolExecutor(16) as pool:
+            reads = list(pool.map(Interpreter.READ, [source] * 100))
+
+        ids = []
+
+        for outer, other in reads:
+            ids += [outer.id, outer.body[0].id, other.id]
+
+        self.assertEqual(len(set(ids)), len(ids))
+
+if __name__ == "__main__":
+    unittest.main()